@@ -0,0 +1,99 @@
+"""
+Content sniffing for uploaded evidence documents.
+
+Formats are identified from their leading bytes so a file's extension is
+only a hint: a JPEG saved as .png, or a legacy Word .doc, is routed by what
+it actually contains.
+"""
+
+import os
+import zipfile
+
+# (offset, signature, format) checked against the first bytes of a file
+MAGIC_SIGNATURES = [
+    (0, b'%PDF-', 'pdf'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image'),
+    (0, b'\xff\xd8\xff', 'image'),
+    (0, b'II*\x00', 'image'),
+    (0, b'MM\x00*', 'image'),
+    (0, b'BM', 'image'),
+    (0, b'GIF87a', 'image'),
+    (0, b'GIF89a', 'image'),
+    (8, b'WEBP', 'image'),
+    (4, b'ftypheic', 'heic'),
+    (4, b'ftypheix', 'heic'),
+    (4, b'ftypmif1', 'heic'),
+    (4, b'ftypmsf1', 'heic'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'ole2'),
+    (0, b'PK\x03\x04', 'zip'),
+]
+
+SNIFF_BYTES = 16
+
+# Extension hints, used when the content has no recognisable signature
+EXTENSION_FORMATS = {
+    '.pdf': 'pdf',
+    '.jpg': 'image', '.jpeg': 'image', '.png': 'image', '.bmp': 'image',
+    '.tiff': 'image', '.tif': 'image', '.gif': 'image', '.webp': 'image',
+    '.heic': 'heic', '.heif': 'heic',
+    '.docx': 'docx',
+    '.doc': 'ole2',
+    '.txt': 'text', '.text': 'text',
+}
+
+def read_head(file_path, stream=None):
+    """
+    Return the first SNIFF_BYTES bytes of a file or seekable stream
+    """
+    if stream is not None:
+        head = stream.read(SNIFF_BYTES)
+        stream.seek(0)
+        return head
+    with open(file_path, 'rb') as f:
+        return f.read(SNIFF_BYTES)
+
+def _zip_format(file_path, stream=None):
+    try:
+        with zipfile.ZipFile(stream if stream is not None else file_path) as archive:
+            names = archive.namelist()
+    except zipfile.BadZipFile:
+        return None
+    finally:
+        if stream is not None:
+            stream.seek(0)
+    return 'docx' if 'word/document.xml' in names else None
+
+def _looks_like_text(head):
+    if b'\x00' in head:
+        return False
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError:
+        # The sniffed bytes may end part-way through a multi-byte character
+        try:
+            head[:-3].decode('utf-8')
+        except UnicodeDecodeError:
+            return False
+    return True
+
+def sniff_format(file_path, stream=None):
+    """
+    Return the document format ('pdf', 'image', 'heic', 'docx', 'ole2' or
+    'text') from the content, falling back to the extension, or None
+    """
+    head = read_head(file_path, stream)
+    for offset, signature, doc_format in MAGIC_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            # 'BM' is a weak signature; a BMP also has four reserved zero bytes
+            if signature == b'BM' and head[6:10] != b'\x00' * 4:
+                continue
+            if doc_format == 'zip':
+                return _zip_format(file_path, stream)
+            return doc_format
+    _, ext = os.path.splitext(file_path)
+    hinted = EXTENSION_FORMATS.get(ext.lower())
+    if hinted is not None:
+        return hinted
+    if head and _looks_like_text(head):
+        return 'text'
+    return None
@@ -1,10 +1,114 @@
 import os
 import json
+import time
+import queue
+import signal
+import itertools
 import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 from werkzeug.utils import secure_filename
 import ocr_utils
 import logging
 
+# Seconds a file may spend in a batch worker before it is abandoned as timed out
+BATCH_FILE_TIMEOUT = float(os.getenv('OCR_BATCH_FILE_TIMEOUT', '300'))
+# Extra seconds the parent waits for a worker whose own timer did not fire
+BATCH_TIMEOUT_GRACE = 30
+
+# Batches OCR one file per worker process, so each process keeps its own
+# OCR thread pools to a single worker and the cores are not oversubscribed.
+# Workers come from a forkserver rather than fork: the parent runs request,
+# job and OCR threads that may hold locks at the moment it would fork.
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+# Workers report (task id, wall time) here when they start a task, since a
+# future also counts as running while it is only queued for a worker
+_batch_started_queue = None
+_batch_started = {}
+_batch_task_ids = itertools.count()
+_worker_processor = None
+_worker_started_queue = None
+
+def _init_batch_worker(ocr_config, started_queue):
+    global _worker_processor, _worker_started_queue
+    # Carry over settings the parent changed at runtime
+    ocr_utils.OCR_CONFIG.update(ocr_config)
+    ocr_utils.OCR_CONFIG['max_workers'] = 1
+    _worker_started_queue = started_queue
+    _worker_processor = DocumentProcessor()
+
+class BatchFileTimeout(BaseException):
+    """
+    Raised in a batch worker when its file runs past the timeout. Derives from
+    BaseException so the OCR fallbacks' `except Exception` blocks let it through.
+    """
+
+def _on_batch_timeout(signum, frame):
+    raise BatchFileTimeout()
+
+def _process_file_in_worker(file_path, timeout, task_id):
+    _worker_started_queue.put((task_id, time.time()))
+    # Tasks run on the worker's main thread, so a timer signal can interrupt them
+    signal.signal(signal.SIGALRM, _on_batch_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return _worker_processor.process_file(file_path)
+    except BatchFileTimeout:
+        logging.error(f"[OCR] Timed out after {timeout:g}s processing {file_path}")
+        return {"success": False, "error": f"Timed out after {timeout:g} seconds"}
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+def _get_batch_pool():
+    global _batch_pool, _batch_started_queue
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            workers = max(1, ocr_utils.OCR_CONFIG['max_workers'])
+            context = multiprocessing.get_context('forkserver')
+            # The server imports the OCR modules once and forks workers from
+            # that single-threaded process. Workers still re-import the app's
+            # script as __mp_main__, so it must be safe to import.
+            context.set_forkserver_preload(['document_processor'])
+            _batch_started_queue = context.Queue()
+            _batch_started.clear()
+            _batch_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_batch_worker,
+                initargs=(dict(ocr_utils.OCR_CONFIG), _batch_started_queue)
+            )
+            logging.info(f"[OCR] Started batch OCR pool with {workers} worker processes")
+        return _batch_pool
+
+def _batch_start_time(task_id):
+    """
+    Return the wall time a worker started a batch task, or None if no worker
+    has picked it up yet
+    """
+    with _batch_pool_lock:
+        while _batch_started_queue is not None:
+            try:
+                started_id, started_at = _batch_started_queue.get_nowait()
+            except queue.Empty:
+                break
+            _batch_started[started_id] = started_at
+        return _batch_started.get(task_id)
+
+def _forget_batch_tasks(task_ids):
+    with _batch_pool_lock:
+        for task_id in task_ids:
+            _batch_started.pop(task_id, None)
+
+def _discard_batch_pool(pool):
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is pool:
+            _batch_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
 class DocumentProcessor:
     def __init__(self, upload_folder=None):
         self.upload_folder = upload_folder or os.path.join(tempfile.gettempdir(), 'uploads')
@@ -23,6 +127,27 @@ class DocumentProcessor:
         logging.info(f"[OCR] Saved uploaded file: {file_path}")
         return file_path
         
+    def process_upload(self, file):
+        """
+        Process an uploaded Werkzeug file straight from its stream, without
+        saving it to the upload folder first
+        """
+        if not file or not file.filename:
+            return {"success": False, "error": "No file selected"}
+        return self.process_stream(file.stream, secure_filename(file.filename))
+    
+    def process_stream(self, stream, filename):
+        """
+        Process a document held in a file-like object, bytes or memoryview.
+        The filename supplies the extension used to pick the extractor.
+        """
+        if stream is None:
+            return {"success": False, "error": "No file selected"}
+        stream = ocr_utils.open_document_stream(stream)
+        file_size = stream.seek(0, os.SEEK_END)
+        stream.seek(0)
+        return self._process(filename, stream, file_size)
+        
     def process_file(self, file_path):
         """
         Process a document file and extract its content
@@ -30,10 +155,14 @@ class DocumentProcessor:
         if not os.path.exists(file_path):
             logging.error(f"[OCR] File not found: {file_path}")
             return {"success": False, "error": "File not found"}
+        return self._process(file_path)
+    
+    def _process(self, file_path, stream=None, file_size=None):
         try:
             logging.info(f"[OCR] Processing file: {file_path}")
             # Extract text from document
-            raw_text = ocr_utils.process_document(file_path)
+            extraction = ocr_utils.extract_document(file_path, stream)
+            raw_text = extraction["text"]
             
             # Check if the result is an error message string
             if isinstance(raw_text, str) and raw_text.startswith("Error"):
@@ -43,7 +172,7 @@ class DocumentProcessor:
             # Clean and normalize text
             cleaned_text = ocr_utils.clean_extracted_text(raw_text)
             # Extract metadata
-            metadata = ocr_utils.extract_document_metadata(file_path)
+            metadata = ocr_utils.extract_document_metadata(file_path, file_size)
             
             # Log the results for debugging
             logging.info(f"[OCR] Raw text length: {len(raw_text)}, Cleaned text length: {len(cleaned_text)}")
@@ -54,7 +183,10 @@ class DocumentProcessor:
                 "success": True,
                 "metadata": metadata,
                 "text": cleaned_text,
-                "text_length": len(cleaned_text)
+                "text_length": len(cleaned_text),
+                "ocr_stats": extraction["stats"],
+                "words": extraction["words"],
+                "truncated": extraction["truncated"]
             }
             
             logging.info(f"[OCR] Successfully processed file: {file_path}, text length: {len(cleaned_text)}")
@@ -72,14 +204,99 @@ class DocumentProcessor:
                 "error": str(e)
             }
             
-    def batch_process_files(self, file_paths):
+    def batch_process_files(self, file_paths, timeout=None, cancel_event=None):
         """
-        Process multiple document files
+        Process multiple document files concurrently
         """
         results = {}
+        for file_path, result in self.iter_process_files(file_paths, timeout, cancel_event):
+            results[os.path.basename(file_path)] = result
+        return results
+    
+    def iter_process_files(self, file_paths, timeout=None, cancel_event=None, on_idle=None):
+        """
+        Process document files in a pool of worker processes and yield
+        (file_path, result) as each file completes, so callers can use the
+        first document while the rest are still being OCRed.
+        
+        A file still running `timeout` seconds after a worker picked it up is
+        abandoned and reported as timed out; setting `cancel_event` (or closing
+        the generator) cancels the files that have not started yet.
+        `on_idle()` is called whenever no further result is ready and the
+        generator is about to wait for one, so callers holding results back
+        can act on them first.
+        """
+        timeout = BATCH_FILE_TIMEOUT if timeout is None else timeout
+        pending_paths = []
         for file_path in file_paths:
             if os.path.exists(file_path):
-                results[os.path.basename(file_path)] = self.process_file(file_path)
+                pending_paths.append(file_path)
             else:
-                results[os.path.basename(file_path)] = {"error": "File not found"}
-        return results
+                yield file_path, {"error": "File not found"}
+        if len(pending_paths) == 1:
+            # A single file keeps the in-process OCR thread pools to itself; it is
+            # bounded by its OCR budget rather than the batch timeout
+            yield pending_paths[0], self.process_file(pending_paths[0])
+            return
+        if not pending_paths:
+            return
+        
+        pool = _get_batch_pool()
+        futures = {}
+        task_ids = {}
+        try:
+            for file_path in pending_paths:
+                task_id = next(_batch_task_ids)
+                future = pool.submit(_process_file_in_worker, file_path, timeout, task_id)
+                futures[future] = file_path
+                task_ids[future] = task_id
+        except BrokenProcessPool as e:
+            _discard_batch_pool(pool)
+            for future in futures:
+                future.cancel()
+            logging.error(f"[OCR] Batch OCR pool unavailable, processing sequentially: {e}")
+            for file_path in pending_paths:
+                if on_idle is not None:
+                    on_idle()
+                yield file_path, self.process_file(file_path)
+            return
+        
+        try:
+            while futures:
+                if cancel_event is not None and cancel_event.is_set():
+                    for future, file_path in list(futures.items()):
+                        if future.cancel():
+                            del futures[future]
+                            yield file_path, {"success": False, "error": "Cancelled"}
+                
+                if on_idle is not None and not any(future.done() for future in futures):
+                    on_idle()
+                done, _ = wait(futures, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        _discard_batch_pool(pool)
+                        logging.error(f"[OCR] Batch worker died while processing {file_path}: {e}")
+                        result = {"success": False, "error": "Worker process failed"}
+                    except Exception as e:
+                        logging.error(f"[OCR] Error processing file {file_path}: {e}", exc_info=True)
+                        result = {"success": False, "error": str(e)}
+                    yield file_path, result
+                
+                # Backstop for a worker stuck where its timer cannot interrupt it.
+                # The pool cannot stop a running task, so the file is reported and
+                # abandoned, and its worker frees up when it ends.
+                now = time.time()
+                for future, file_path in list(futures.items()):
+                    started_at = _batch_start_time(task_ids[future])
+                    if started_at is not None and not future.done():
+                        if now - started_at >= timeout + BATCH_TIMEOUT_GRACE:
+                            del futures[future]
+                            logging.error(f"[OCR] Timed out after {timeout}s processing {file_path}")
+                            yield file_path, {"success": False, "error": f"Timed out after {timeout:g} seconds"}
+        finally:
+            for future in futures:
+                future.cancel()
+            _forget_batch_tasks(task_ids.values())
@@ -0,0 +1,154 @@
+"""
+In-memory index of the shared evidence directory.
+
+The Node backend copies evidence into the directory as "<userId>_<filename>"
+and asks for files by that name, by user id, or by the original filename.
+The index keeps exact-name, user-id prefix and original-filename maps so
+those lookups are dictionary hits, and it only rescans the directory when
+the directory's mtime shows entries were added, removed or renamed.
+"""
+
+import os
+import time
+import bisect
+import logging
+import threading
+
+# Directory mtimes can be this coarse (e.g. on some bind mounts), so a scan
+# made within this window of the last change may have missed an entry
+MTIME_GRANULARITY_SECONDS = 2.0
+
+def _split_name(name):
+    """
+    Return (userId, original filename) for a "<userId>_<filename>" name,
+    or (None, None) for names without an underscore
+    """
+    prefix, sep, suffix = name.partition('_')
+    return (prefix, suffix) if sep else (None, None)
+
+class EvidenceIndex:
+    """
+    Name lookups over one evidence directory, refreshed by mtime-checked
+    incremental rescans
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._names = set()
+        self._sorted_names = []
+        self._by_user = {}
+        self._by_original = {}
+        self._mtime_ns = None
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+
+    def _add(self, name):
+        self._names.add(name)
+        bisect.insort(self._sorted_names, name)
+        user, original = _split_name(name)
+        if user is not None:
+            bisect.insort(self._by_user.setdefault(user, []), name)
+            bisect.insort(self._by_original.setdefault(original, []), name)
+
+    def _remove(self, name):
+        self._names.discard(name)
+        self._sorted_names.pop(bisect.bisect_left(self._sorted_names, name))
+        user, original = _split_name(name)
+        if user is not None:
+            for index, key in ((self._by_user, user), (self._by_original, original)):
+                names = index[key]
+                names.pop(bisect.bisect_left(names, name))
+                if not names:
+                    del index[key]
+
+    def _rebuild(self, names):
+        self._names = set(names)
+        self._sorted_names = sorted(names)
+        self._by_user = {}
+        self._by_original = {}
+        for name in self._sorted_names:
+            user, original = _split_name(name)
+            if user is not None:
+                self._by_user.setdefault(user, []).append(name)
+                self._by_original.setdefault(original, []).append(name)
+
+    def refresh(self):
+        """
+        Rescan the directory if it changed since the last scan. Returns
+        False when the directory does not exist.
+        """
+        with self._lock:
+            try:
+                mtime_ns = os.stat(self.directory).st_mtime_ns
+            except FileNotFoundError:
+                self._rebuild(())
+                self._mtime_ns = None
+                return False
+            # A scan made in the same mtime tick as the last change may be stale
+            settled = self._scanned_at - mtime_ns / 1e9 > MTIME_GRANULARITY_SECONDS
+            if mtime_ns == self._mtime_ns and settled:
+                return True
+            scanned_at = time.time()
+            current = set(os.listdir(self.directory))
+            added = current - self._names
+            removed = self._names - current
+            if len(added) + len(removed) > len(current) // 8:
+                # Sorting once beats many sorted inserts for large changes
+                self._rebuild(current)
+            else:
+                for name in removed:
+                    self._remove(name)
+                for name in added:
+                    self._add(name)
+            self._mtime_ns = mtime_ns
+            self._scanned_at = scanned_at
+            if added or removed:
+                logging.info(f"[EVIDENCE-INDEX] {self.directory}: +{len(added)} -{len(removed)} entries, {len(self._names)} total")
+            return True
+
+    def names(self):
+        """
+        Return every entry name in the directory, sorted
+        """
+        self.refresh()
+        with self._lock:
+            return list(self._sorted_names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def resolve(self, name):
+        """
+        Return the path of the evidence file for a requested name, or None.
+
+        Tried in order: the exact name; another file of the same user (the
+        name's "<userId>_" prefix, or the name itself as a user id); a file
+        whose original filename is the name; and as a last resort any entry
+        containing the name.
+        """
+        self.refresh()
+        with self._lock:
+            match = self._lookup(name)
+        if match is None:
+            return None
+        if match != name:
+            logging.info(f"[EVIDENCE-INDEX] Mapped requested name {name} to file {match}")
+        return os.path.join(self.directory, match)
+
+    def _lookup(self, name):
+        if name in self._names:
+            return name
+        user, _ = _split_name(name)
+        for key in (user, name):
+            candidates = self._by_user.get(key)
+            if candidates:
+                return candidates[0]
+        candidates = self._by_original.get(name)
+        if candidates:
+            return candidates[0]
+        # Substring matches cannot be indexed; scan the cached names instead
+        # of the directory
+        for candidate in self._sorted_names:
+            if name in candidate:
+                return candidate
+        return None
@@ -0,0 +1,93 @@
+"""
+Token budgeting for multi-document LLM extraction.
+
+The documents of one claim are packed greedily, in the order their OCR text
+arrives, into batches whose prompt plus reserved completion fits the
+model's context window, so the schema and instructions are sent once per
+batch instead of once per document. A document too large to share a batch
+is returned on its own, to be sent with the single-document prompt. When a
+partial batch is sent is up to the caller; extract_evidence flushes it
+whenever OCR has no further document ready.
+"""
+
+import logging
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Characters per token assumed when tiktoken is unavailable; OCR noise
+# tokenizes poorly, so this errs towards overcounting
+CHARS_PER_TOKEN_ESTIMATE = 3
+
+_encodings = {}
+
+def _get_encoding(model):
+    if model not in _encodings:
+        encoding = None
+        if tiktoken is not None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except Exception as e:
+                # Unknown model, or the encoding file could not be downloaded
+                logging.warning(f"[EXTRACT] No tiktoken encoding for {model}, estimating token counts: {e}")
+        _encodings[model] = encoding
+    return _encodings[model]
+
+def count_tokens(text, model):
+    """
+    Return the number of tokens text takes for a model
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN_ESTIMATE + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+class DocumentBatcher:
+    """
+    Packs (filename, text) documents into token-budgeted batches.
+
+    base_tokens is the size of the batch prompt without any documents. Each
+    document costs its text and filename, section_tokens for its section
+    header, and output_tokens_per_document reserved for its results. A
+    batch's reserved output also stays within max_output_tokens, the
+    model's completion limit.
+    """
+
+    def __init__(self, model, base_tokens, section_tokens, context_tokens,
+                 output_tokens_per_document, max_output_tokens):
+        self.model = model
+        self.base_tokens = base_tokens
+        self.section_tokens = section_tokens
+        self.context_tokens = context_tokens
+        self.output_tokens_per_document = output_tokens_per_document
+        self.max_documents = max(1, max_output_tokens // output_tokens_per_document)
+        self._pending = []
+        self._pending_tokens = 0
+
+    def add(self, fname, text):
+        """
+        Add a document and return the batches that are now ready to send
+        """
+        cost = (count_tokens(fname, self.model) + count_tokens(text, self.model)
+                + self.section_tokens + self.output_tokens_per_document)
+        if self.base_tokens + cost > self.context_tokens:
+            logging.info(f"[EXTRACT] {fname} exceeds the batch token budget, extracting it on its own")
+            return [[(fname, text)]]
+        ready = []
+        if self._pending and (self.base_tokens + self._pending_tokens + cost > self.context_tokens
+                              or len(self._pending) >= self.max_documents):
+            ready.append(self.flush())
+        self._pending.append((fname, text))
+        self._pending_tokens += cost
+        return ready
+
+    def flush(self):
+        """
+        Return the pending batch, possibly empty, and start a new one
+        """
+        batch = self._pending
+        self._pending = []
+        self._pending_tokens = 0
+        return batch
@@ -0,0 +1,260 @@
+"""
+Asynchronous evidence extraction jobs.
+
+Submitting a job returns its id at once; the files are extracted on a
+background thread pool and each file's result is stored as soon as it is
+final, so a client can poll for per-file progress and partial results
+instead of holding a connection open for the whole OCR and LLM run. Jobs
+live in a SQLite database, and jobs a restart interrupted are resumed on
+startup from the files they had not finished. A job can name a callback
+URL to receive the finished job; only http(s) URLs on the hosts listed in
+EXTRACT_CALLBACK_ALLOWED_HOSTS are accepted, so clients cannot point the
+service at arbitrary internal addresses.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_JOBS_DIR = os.path.join(os.path.dirname(__file__), 'extraction_jobs')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+def callback_allowed(callback_url):
+    """
+    Return whether a callback URL is http(s) and its host is listed in the
+    comma-separated EXTRACT_CALLBACK_ALLOWED_HOSTS (host or host:port)
+    """
+    if not isinstance(callback_url, str):
+        return False
+    allowed = {host.strip().lower() for host in os.getenv('EXTRACT_CALLBACK_ALLOWED_HOSTS', '').split(',') if host.strip()}
+    try:
+        parts = urlsplit(callback_url)
+        port = parts.port
+    except ValueError:
+        return False
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return False
+    host = parts.hostname.lower()
+    return host in allowed or (port is not None and f"{host}:{port}" in allowed)
+
+class ExtractionJobStore:
+    """
+    Persistent store of extraction jobs and their per-file results.
+
+    Each call opens its own connection, so the store can be shared by the
+    request threads and the job workers.
+    """
+
+    def __init__(self, jobs_dir=None, retention_seconds=24 * 3600):
+        self.jobs_dir = jobs_dir or os.getenv('EXTRACT_JOBS_DIR', DEFAULT_JOBS_DIR)
+        self.retention_seconds = retention_seconds
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self.db_path = os.path.join(self.jobs_dir, 'extraction_jobs.sqlite3')
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY,'
+                ' status TEXT NOT NULL,'
+                ' files TEXT NOT NULL,'
+                ' callback_url TEXT,'
+                ' error TEXT,'
+                ' created REAL NOT NULL,'
+                ' updated REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS job_results ('
+                ' job_id TEXT NOT NULL,'
+                ' fname TEXT NOT NULL,'
+                ' result TEXT NOT NULL,'
+                ' PRIMARY KEY (job_id, fname))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)')
+        logging.info(f"[EXTRACT-JOBS] Using job store at {self.db_path}")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def create(self, files, callback_url=None):
+        """
+        Record a new queued job and return its id
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, files, callback_url, created, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, QUEUED, json.dumps(files), callback_url, now, now)
+            )
+        return job_id
+
+    def set_status(self, job_id, status, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?',
+                (status, error, time.time(), job_id)
+            )
+
+    def record_result(self, job_id, fname, result):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO job_results (job_id, fname, result) VALUES (?, ?, ?)',
+                (job_id, fname, json.dumps(result))
+            )
+            conn.execute('UPDATE jobs SET updated = ? WHERE id = ?', (time.time(), job_id))
+
+    def get(self, job_id):
+        """
+        Return a job's status, per-file progress and results so far, or None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT status, files, callback_url, error, created, updated FROM jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            stored = dict(conn.execute(
+                'SELECT fname, result FROM job_results WHERE job_id = ?', (job_id,)
+            ).fetchall())
+        status, files, callback_url, error, created, updated = row
+        files = json.loads(files)
+        return {
+            "jobId": job_id,
+            "status": status,
+            "total": len(files),
+            "completed": len(stored),
+            "files": {fname: self._file_state(fname, stored, status) for fname in files},
+            "results": {fname: json.loads(stored[fname]) for fname in files if fname in stored},
+            "error": error,
+            "callbackUrl": callback_url,
+            "createdAt": created,
+            "updatedAt": updated,
+        }
+
+    @staticmethod
+    def _file_state(fname, stored, status):
+        if fname in stored:
+            return "done"
+        # Files the extraction skipped (e.g. directories) never get a result
+        return "skipped" if status in (COMPLETED, FAILED) else "pending"
+
+    def unfinished(self):
+        """
+        Return the ids of queued or running jobs, oldest first
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created', (QUEUED, RUNNING)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def prune(self):
+        """
+        Delete finished jobs last updated before the retention window
+        """
+        cutoff = time.time() - self.retention_seconds
+        with self._connect() as conn:
+            stale = [row[0] for row in conn.execute(
+                'SELECT id FROM jobs WHERE status IN (?, ?) AND updated < ?', (COMPLETED, FAILED, cutoff)
+            ).fetchall()]
+            for job_id in stale:
+                conn.execute('DELETE FROM job_results WHERE job_id = ?', (job_id,))
+                conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+        if stale:
+            logging.info(f"[EXTRACT-JOBS] Pruned {len(stale)} finished jobs")
+
+class ExtractionJobManager:
+    """
+    Runs extraction jobs on a background thread pool.
+
+    runner(files, on_result) extracts the given evidence files and calls
+    on_result(fname, result) as each file's result is final; it raises to
+    fail the whole job.
+    """
+
+    def __init__(self, store, runner, max_workers=2):
+        self.store = store
+        self.runner = runner
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='extract-job')
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def submit(self, files, callback_url=None):
+        """
+        Queue a job for the given files and return its id
+        """
+        self.store.prune()
+        job_id = self.store.create(files, callback_url)
+        logging.info(f"[EXTRACT-JOBS] Queued job {job_id} for {len(files)} files")
+        self._start(job_id)
+        return job_id
+
+    def resume(self):
+        """
+        Restart jobs a previous process left queued or running
+        """
+        job_ids = self.store.unfinished()
+        if job_ids:
+            logging.info(f"[EXTRACT-JOBS] Resuming {len(job_ids)} unfinished jobs")
+        for job_id in job_ids:
+            self._start(job_id)
+
+    def _start(self, job_id):
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        try:
+            job = self.store.get(job_id)
+            if job is None:
+                return
+            # A resumed job only extracts the files it had not finished
+            remaining = [fname for fname, state in job["files"].items() if state == "pending"]
+            self.store.set_status(job_id, RUNNING)
+            try:
+                # The runner treats an empty list as "every evidence file"
+                if remaining:
+                    self.runner(remaining, lambda fname, result: self.store.record_result(job_id, fname, result))
+            except Exception as e:
+                logging.error(f"[EXTRACT-JOBS] Job {job_id} failed: {e}", exc_info=True)
+                self.store.set_status(job_id, FAILED, error=str(e))
+            else:
+                self.store.set_status(job_id, COMPLETED)
+                logging.info(f"[EXTRACT-JOBS] Job {job_id} completed")
+            if job["callbackUrl"]:
+                self._notify(job_id, job["callbackUrl"])
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def _notify(self, job_id, callback_url):
+        """
+        POST the finished job to its callback URL; failures are only logged,
+        the client can still poll for the result
+        """
+        # The allowlist may have changed since a resumed job was submitted
+        if not callback_allowed(callback_url):
+            logging.warning(f"[EXTRACT-JOBS] Callback for job {job_id} to {callback_url} is not allowed, skipping")
+            return
+        try:
+            # Redirects could lead off the allowlist, so they are not followed
+            response = requests.post(callback_url, json=self.store.get(job_id), timeout=10, allow_redirects=False)
+            logging.info(f"[EXTRACT-JOBS] Callback for job {job_id} returned {response.status_code}")
+        except requests.RequestException as e:
+            logging.error(f"[EXTRACT-JOBS] Callback for job {job_id} to {callback_url} failed: {e}")
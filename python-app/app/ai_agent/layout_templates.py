@@ -0,0 +1,67 @@
+"""
+Field regions for evidence documents with stable layouts.
+
+Templates are keyed by the document types returned by
+DocumentClassifier.detect_document_type. Each region box is
+(left, top, right, bottom) as fractions of the upright page, so it applies
+at any resolution. The boxes are calibrated against the scans in
+Test Docs/Customer_test_documents and include a small margin.
+"""
+
+SINGLE_LINE = '--psm 7 --oem 1'
+TEXT_BLOCK = '--psm 6 --oem 1'
+
+LAYOUT_TEMPLATES = {
+    'death_certificate': [
+        {'field': 'deceasedName', 'label': 'Name and surname', 'box': (0.45, 0.255, 0.94, 0.300), 'config': SINGLE_LINE},
+        {'field': 'deceasedDateOfDeath', 'label': 'Date of death', 'box': (0.45, 0.305, 0.94, 0.343), 'config': SINGLE_LINE},
+        {'field': 'deceasedPlaceOfDeath', 'label': 'Place of death', 'box': (0.45, 0.350, 0.94, 0.410), 'config': TEXT_BLOCK},
+        {'field': 'deceasedDateOfBirth', 'label': 'Date of birth', 'box': (0.45, 0.420, 0.94, 0.455), 'config': SINGLE_LINE},
+        {'field': 'deceasedAddress', 'label': 'Occupation and usual address', 'box': (0.45, 0.460, 0.94, 0.550), 'config': TEXT_BLOCK},
+        {'field': 'informant', 'label': 'Informant, qualification and address', 'box': (0.45, 0.555, 0.94, 0.675), 'config': TEXT_BLOCK},
+        {'field': 'deceasedCauseOfDeath', 'label': 'Cause of death', 'box': (0.45, 0.685, 0.94, 0.720), 'config': SINGLE_LINE},
+        {'field': 'deceasedCertificateIssued', 'label': 'Date of registration', 'box': (0.45, 0.730, 0.94, 0.765), 'config': SINGLE_LINE},
+        {'field': 'deceasedCertifyingDoctor', 'label': 'Registrar', 'box': (0.45, 0.775, 0.94, 0.815), 'config': SINGLE_LINE},
+    ],
+    'birth_certificate': [
+        {'field': 'entryNumber', 'label': 'Entry number', 'box': (0.73, 0.125, 0.90, 0.170), 'config': SINGLE_LINE},
+        {'field': 'name', 'label': 'Name and surname', 'box': (0.42, 0.190, 0.92, 0.235), 'config': SINGLE_LINE},
+        {'field': 'dateOfBirth', 'label': 'Date of birth', 'box': (0.42, 0.290, 0.92, 0.335), 'config': SINGLE_LINE},
+        {'field': 'father', 'label': 'Name and surname of father', 'box': (0.42, 0.345, 0.92, 0.390), 'config': SINGLE_LINE},
+        {'field': 'mother', 'label': 'Name and maiden surname of mother', 'box': (0.42, 0.405, 0.92, 0.480), 'config': TEXT_BLOCK},
+        {'field': 'informant', 'label': 'Signature, residence and description of informant', 'box': (0.42, 0.540, 0.92, 0.645), 'config': TEXT_BLOCK},
+        {'field': 'dateRegistered', 'label': 'When registered', 'box': (0.42, 0.652, 0.92, 0.690), 'config': SINGLE_LINE},
+    ],
+    'funeral_invoice': [
+        {'field': 'funeralDirector', 'label': 'Funeral director', 'box': (0.20, 0.090, 0.78, 0.185), 'config': TEXT_BLOCK},
+        {'field': 'funeralDateIssued', 'label': 'Invoice date', 'box': (0.70, 0.195, 0.96, 0.235), 'config': SINGLE_LINE},
+        {'field': 'billedTo', 'label': 'Billed to', 'box': (0.06, 0.250, 0.37, 0.355), 'config': TEXT_BLOCK},
+        {'field': 'funeralEstimateNumber', 'label': 'Invoice number', 'box': (0.06, 0.380, 0.50, 0.420), 'config': SINGLE_LINE},
+        {'field': 'funeralDescription', 'label': 'Items', 'box': (0.07, 0.485, 0.93, 0.765), 'config': TEXT_BLOCK},
+        {'field': 'funeralTotalEstimatedCost', 'label': 'Total', 'box': (0.64, 0.765, 0.93, 0.815), 'config': SINGLE_LINE},
+    ],
+    'benefit_letter': [
+        {'field': 'benefitType', 'label': 'Benefit', 'box': (0.08, 0.195, 0.45, 0.240), 'config': SINGLE_LINE},
+        {'field': 'benefitLetterDate', 'label': 'Letter date', 'box': (0.70, 0.195, 0.92, 0.235), 'config': SINGLE_LINE},
+        {'field': 'recipient', 'label': 'Recipient name and address', 'box': (0.58, 0.260, 0.92, 0.395), 'config': TEXT_BLOCK},
+        {'field': 'nationalInsuranceNumber', 'label': 'National Insurance number', 'box': (0.58, 0.415, 0.92, 0.470), 'config': TEXT_BLOCK},
+        {'field': 'benefitReferenceNumber', 'label': 'Reference', 'box': (0.58, 0.490, 0.92, 0.548), 'config': TEXT_BLOCK},
+        {'field': 'entitlement', 'label': 'Letter body', 'box': (0.08, 0.555, 0.92, 0.720), 'config': TEXT_BLOCK},
+    ],
+}
+
+def get_layout_template(document_type):
+    """
+    Return the list of field regions for a document type, or None
+    """
+    return LAYOUT_TEMPLATES.get(document_type)
+
+def region_pixels(template, width, height):
+    """
+    Convert a template's fractional boxes to pixel boxes for an image size
+    """
+    return [
+        (region, (int(region['box'][0] * width), int(region['box'][1] * height),
+                  int(region['box'][2] * width), int(region['box'][3] * height)))
+        for region in template
+    ]
@@ -12,6 +12,8 @@ import sys
 import json
 import time
 import gc
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from flask import Flask, request, jsonify, render_template, redirect, url_for
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langgraph.graph import StateGraph, END
@@ -25,6 +27,9 @@ import document_processor
 import ai_document_processor
 from date_normalizer import DateNormalizer
 from document_classifier import DocumentClassifier
+from extraction_jobs import ExtractionJobManager, ExtractionJobStore, callback_allowed
+from evidence_index import EvidenceIndex
+from extraction_batches import DocumentBatcher, count_tokens
 
 # Configure logging
 logging.basicConfig(
@@ -98,8 +103,10 @@ def load_rag_database():
         logging.error(f"[INIT] Error loading RAG database: {e}", exc_info=True)
         return False
 
-# Load RAG database on module initialization
-load_rag_database()
+# Load RAG database on module initialization. Batch OCR worker processes
+# import this script as __mp_main__ and have no use for it.
+if __name__ != '__mp_main__':
+    load_rag_database()
 
 # API routes
 @app.route('/ai-agent/docs', methods=['GET'])
@@ -2289,8 +2296,7 @@ def guess_document_type_from_filename(filename):
     This function is maintained for backward compatibility.
     The DocumentClassifier class provides more comprehensive detection.
     """
-    # Create a temporary instance of the DocumentClassifier
-    doc_classifier = DocumentClassifier()
+    doc_classifier = get_extraction_components().document_classifier
     
     # Use the document classifier to detect the type
     doc_type = doc_classifier.detect_document_type("", filename)
@@ -2306,149 +2312,11 @@ def guess_document_type_from_filename(filename):
     
     return type_mapping.get(doc_type, "Unknown Document")
 
-@app.route('/ai-agent/extract-form-data', methods=['POST'])
-def extract_form_data():
-    """
-    Endpoint to extract data from evidence documents for form auto-filling
-    """
-    # Shared evidence directory - use the volume path inside the container
-    docs_dir = "/shared-evidence"
-    logging.info(f"[EXTRACT] Scanning evidence directory: {docs_dir}")
-    
-    # Print environment variables for debugging (redact API keys)
-    env_vars = {k: (v[:5] + '...' if 'KEY' in k and v else v) for k, v in os.environ.items()}
-    logging.info(f"[EXTRACT] Environment variables: {env_vars}")
-    
-    # Check if directory exists
-    if not os.path.exists(docs_dir):
-        logging.error(f"[EXTRACT] Evidence directory does not exist: {docs_dir}")
-        return jsonify({"error": f"Evidence directory not found: {docs_dir}"})
-        
-    # List all files in the directory for debugging
-    all_files = os.listdir(docs_dir) if os.path.exists(docs_dir) else []
-    logging.info(f"[EXTRACT] All files in evidence directory: {all_files}")
-    
-    extracted = {}
-    
-    # Initialize document processor for OCR
-    document_processor_instance = document_processor.DocumentProcessor(upload_folder=docs_dir)
-    
-    # Initialize AI document processor for langchain integration
-    ai_document_processor_instance = None
-    try:
-        ai_document_processor_instance = ai_document_processor.AIDocumentProcessor()
-        logging.info("[EXTRACT] AI Document Processor initialized successfully")
-    except Exception as e:
-        logging.error(f"[EXTRACT] Failed to initialize AI Document Processor: {e}", exc_info=True)
-        
-    # Initialize date normalizer and document classifier
-    date_normalizer = DateNormalizer()
-    document_classifier = DocumentClassifier()
-    logging.info("[EXTRACT] Date Normalizer and Document Classifier initialized")
-    
-    # Get the list of files from the request, if provided
-    requested_files = []
-    if request.json and 'files' in request.json:
-        requested_files = request.json.get('files', [])
-        logging.info(f"[EXTRACT] Processing requested files: {requested_files}")
-    
-    # Process all files in the directory if no specific files requested
-    file_list = requested_files if requested_files else os.listdir(docs_dir)
-    
-    # Create a map of file ID prefixes to full filenames for matching
-    file_prefix_map = {}
-    all_files_in_dir = os.listdir(docs_dir)
-    for full_filename in all_files_in_dir:
-        # For each file in the directory, check if it matches one of our requested files
-        for requested_id in requested_files:
-            # Exact match
-            if full_filename == requested_id:
-                file_prefix_map[requested_id] = full_filename
-                logging.info(f"[EXTRACT] Found exact match for requested ID {requested_id}")
-                break
-            # Prefix match (userId_filename pattern)
-            if requested_id.count('_') > 0 and full_filename.startswith(requested_id.split('_')[0] + '_'):
-                file_prefix_map[requested_id] = full_filename
-                logging.info(f"[EXTRACT] Mapped requested ID {requested_id} to file {full_filename}")
-                break
-    
-    logging.info(f"[EXTRACT] File prefix map: {file_prefix_map}")
-    
-    for fname in file_list:
-        # If this is a requested ID and we found a matching file, use the full filename
-        actual_filename = file_prefix_map.get(fname, fname)
-        file_path = os.path.join(docs_dir, actual_filename)
-        
-        if not os.path.exists(file_path):
-            logging.warning(f"[EXTRACT] File not found: {file_path}")
-            # Look for files with three patterns:
-            # 1. Files that start with the ID followed by underscore (new pattern)
-            # 2. Files that exactly match the filename (original pattern)
-            # 3. Files that contain the filename as a substring
-            matching_files = [f for f in all_files_in_dir if 
-                             (f.startswith(f"{fname}_") or 
-                              f == fname or 
-                              fname in f)]
-            
-            if matching_files:
-                actual_filename = matching_files[0]
-                file_path = os.path.join(docs_dir, actual_filename)
-                logging.info(f"[EXTRACT] Found matching file: {actual_filename}")
-            else:
-                extracted[fname] = "Error: File not found"
-                continue
-            
-        if not os.path.isfile(file_path):
-            logging.warning(f"[EXTRACT] Not a file: {file_path}")
-            continue
-            
-        logging.info(f"[EXTRACT] Processing file: {file_path}")
-        
-        try:
-            # Process the document using the document processor to extract text
-            processing_result = document_processor_instance.process_file(file_path)
-            
-            if not processing_result.get("success", False):
-                logging.error(f"[EXTRACT] Document processing failed: {processing_result.get('error')}")
-                extracted[fname] = f"Error: Document processing failed: {processing_result.get('error')}"
-                continue
-                
-            content = processing_result.get("text", "")
-            logging.info(f"[EXTRACT] Successfully extracted {len(content)} characters from document")
-            
-            # Check if we actually got any meaningful content - VERY MINIMAL CHECK
-            # Even just a few characters might contain useful info when OCR fails partially
-            if not content:  # Only filter out completely empty text
-                logging.warning(f"[EXTRACT] Insufficient text content extracted from {fname}: '{content}'")
-                
-                # Return a warning in a standardized JSON format instead of an error
-                warning_result = {
-                    "_warning": {
-                        "value": "Limited or no text could be extracted from this file.",
-                        "reasoning": "The OCR process couldn't extract meaningful text from this image. This could be due to low image quality, handwritten text, or other factors."
-                    }
-                }
-                
-                # Use document classifier to detect document type from filename
-                doc_type = document_classifier.detect_document_type("", fname)
-                doc_type_display = doc_type.replace('_', ' ').title()
-                
-                warning_result["_fileType"] = {
-                    "value": doc_type_display,
-                    "reasoning": "Detected from filename patterns"
-                }
-                
-                # Add document type field for better form matching
-                warning_result["_documentType"] = {
-                    "value": doc_type_display,
-                    "reasoning": f"Detected as {doc_type_display} based on filename analysis"
-                }
-                
-                extracted[fname] = json.dumps(warning_result, indent=4)
-                continue
-            
-            # Application schema summary (field: description)
-            schema = '''
+# Shared evidence directory - the volume path inside the container
+EVIDENCE_DIR = "/shared-evidence"
+
+# Application schema summary (field: description) given to the LLM for evidence extraction
+EXTRACTION_SCHEMA = '''
 firstName: Applicant's first name
 lastName: Applicant's last name
 dateOfBirth: Applicant's date of birth
@@ -2494,8 +2362,137 @@ funeralDescription: Funeral description
 funeralContact: Funeral contact
 evidence: Evidence documents (array)
 '''
-            # Use LLM to extract information
-            prompt = f'''
+
+# Reading guidance for noisy OCR text, shared by the single and batched prompts
+EXTRACTION_GUIDANCE = '''SUPER IMPORTANT: The OCR text may be VERY limited, noisy, or fragmented, especially for scanned documents. You must try your absolute best to identify ANY relevant information, even if the text is extremely minimal. Even partial names, dates, addresses, or just a few words can be valuable.
+
+1. For scanned letters, look for patterns like department names, reference numbers, dates, and recipient names.
+2. For scanned certificates, look for official terminology like "certificate", "death", "birth", etc.
+3. For scanned invoices, look for amount formats, company names, and service descriptions.
+4. For images, even a few words can indicate document type.'''
+
+# Model used for evidence extraction, its context window and completion limit
+EXTRACT_MODEL = "gpt-3.5-turbo"
+EXTRACT_CONTEXT_TOKENS = int(os.getenv('EXTRACT_CONTEXT_TOKENS', '16385'))
+EXTRACT_MAX_OUTPUT_TOKENS = 4096
+
+# Send a claim's documents to the LLM together when they fit the token
+# budget, reserving this many completion tokens for each document's fields
+EXTRACT_BATCH_ENABLED = os.getenv('EXTRACT_BATCH_LLM', 'true').lower() != 'false'
+EXTRACT_OUTPUT_TOKENS_PER_DOCUMENT = 700
+
+class ExtractionComponents:
+    """
+    Process-wide components for evidence extraction, built once per worker
+    instead of on every request. They hold no per-request state, so the
+    request threads and job workers share them. The AI document processor
+    is only built on first use, since extraction itself does not need it.
+    """
+    def __init__(self):
+        # Extraction OCRs files in place, so the default upload folder is fine
+        self.document_processor = document_processor.DocumentProcessor()
+        self.date_normalizer = DateNormalizer()
+        self.document_classifier = DocumentClassifier()
+        self.llm = None
+        if openai_key:
+            self.llm = ChatOpenAI(
+                model_name=EXTRACT_MODEL,
+                temperature=0.0,
+                openai_api_key=openai_key
+            )
+        self._ai_document_processor = None
+        self._lock = threading.Lock()
+        logging.info("[EXTRACT] Extraction components initialized")
+    
+    @property
+    def ai_document_processor(self):
+        """The langchain AI document processor, or None if it failed to build"""
+        with self._lock:
+            if self._ai_document_processor is None:
+                try:
+                    self._ai_document_processor = ai_document_processor.AIDocumentProcessor()
+                    logging.info("[EXTRACT] AI Document Processor initialized successfully")
+                except Exception as e:
+                    logging.error(f"[EXTRACT] Failed to initialize AI Document Processor: {e}", exc_info=True)
+            return self._ai_document_processor
+
+# Index of the shared evidence directory, created on first use
+_evidence_index = None
+_evidence_index_lock = threading.Lock()
+
+def get_evidence_index():
+    """Get or create the evidence directory index"""
+    global _evidence_index
+    with _evidence_index_lock:
+        if _evidence_index is None:
+            _evidence_index = EvidenceIndex(EVIDENCE_DIR)
+        return _evidence_index
+
+# Shared extraction components, created once per worker process
+_extraction_components = None
+_extraction_components_lock = threading.Lock()
+
+def get_extraction_components():
+    """Get or create the shared extraction components"""
+    global _extraction_components
+    with _extraction_components_lock:
+        if _extraction_components is None:
+            _extraction_components = ExtractionComponents()
+        return _extraction_components
+
+# Upper bound on evidence files whose LLM extraction runs at once, across requests
+EXTRACT_MAX_CONCURRENCY = int(os.getenv('EXTRACT_MAX_CONCURRENCY', '4'))
+
+# Thread pool for LLM extraction calls; they are I/O-bound, so threads overlap them
+_extract_executor = None
+_extract_executor_lock = threading.Lock()
+
+def get_extract_executor():
+    """Get or create the thread pool for LLM extraction calls"""
+    global _extract_executor
+    with _extract_executor_lock:
+        if _extract_executor is None:
+            _extract_executor = ThreadPoolExecutor(
+                max_workers=max(1, EXTRACT_MAX_CONCURRENCY),
+                thread_name_prefix='extract-llm'
+            )
+        return _extract_executor
+
+def _no_text_result(fname, document_classifier):
+    """
+    Standardized warning result for a file OCR produced no text for
+    """
+    warning_result = {
+        "_warning": {
+            "value": "Limited or no text could be extracted from this file.",
+            "reasoning": "The OCR process couldn't extract meaningful text from this image. This could be due to low image quality, handwritten text, or other factors."
+        }
+    }
+    
+    # Use document classifier to detect document type from filename
+    doc_type = document_classifier.detect_document_type("", fname)
+    doc_type_display = doc_type.replace('_', ' ').title()
+    
+    warning_result["_fileType"] = {
+        "value": doc_type_display,
+        "reasoning": "Detected from filename patterns"
+    }
+    
+    # Add document type field for better form matching
+    warning_result["_documentType"] = {
+        "value": doc_type_display,
+        "reasoning": f"Detected as {doc_type_display} based on filename analysis"
+    }
+    return json.dumps(warning_result, indent=4)
+
+def _extract_fields_from_text(fname, content, llm, document_classifier, date_normalizer):
+    """
+    Extract claim fields from one document's text with the LLM and return
+    the normalized result as a JSON string (or an error message)
+    """
+    schema = EXTRACTION_SCHEMA
+    # Use LLM to extract information
+    prompt = f'''
 You are an expert assistant helping to process evidence for a funeral expenses claim. The following is the application schema:
 {schema}
 
@@ -2506,12 +2503,7 @@ For each field you can extract, provide:
 - The value
 - A short explanation of your reasoning or the evidence source
 
-SUPER IMPORTANT: The OCR text may be VERY limited, noisy, or fragmented, especially for scanned documents. You must try your absolute best to identify ANY relevant information, even if the text is extremely minimal. Even partial names, dates, addresses, or just a few words can be valuable.
-
-1. For scanned letters, look for patterns like department names, reference numbers, dates, and recipient names.
-2. For scanned certificates, look for official terminology like "certificate", "death", "birth", etc.
-3. For scanned invoices, look for amount formats, company names, and service descriptions.
-4. For images, even a few words can indicate document type.
+{EXTRACTION_GUIDANCE}
 
 CRITICAL: The document filename itself provides important clues about the document type. Analyze it carefully.
 Filename: {fname}
@@ -2523,64 +2515,339 @@ Return your answer as a JSON object where each key is a field name, and each val
 Evidence text:
 {content}
 '''
-            # Initialize LLM if needed
-            if not openai_key:
-                logging.error("[EXTRACT] OpenAI API key not available for LLM invocation")
-                # Use document classifier to detect document type from filename
-                doc_type = document_classifier.detect_document_type(content, fname)
-                doc_type_display = doc_type.replace('_', ' ').title()
+    if llm is None:
+        # Use document classifier to detect document type from filename
+        doc_type = document_classifier.detect_document_type(content, fname)
+        doc_type_display = doc_type.replace('_', ' ').title()
+        
+        return json.dumps({
+            "_error": {
+                "value": "AI service unavailable - API key missing",
+                "reasoning": "The OpenAI API key is not configured. Please check server configuration."
+            },
+            "_fileType": {
+                "value": doc_type_display,
+                "reasoning": "Detected from document content and filename patterns"
+            }
+        })
+    
+    try:
+        # Get AI extraction response
+        response = llm.invoke(prompt)
+        raw_response = str(response.content) if hasattr(response, 'content') else str(response)
+        
+        # Parse the extracted JSON data
+        try:
+            # Convert the raw string response to Python dict
+            extracted_data = json.loads(raw_response)
+            return _normalize_extracted_fields(fname, content, extracted_data, document_classifier, date_normalizer)
+        except json.JSONDecodeError:
+            # If JSON parsing fails, return the raw response
+            logging.error(f"[EXTRACT] Failed to parse JSON from LLM response for {fname}")
+            return raw_response
+    except Exception as e:
+        logging.error(f"[EXTRACT ERROR] LLM invocation error for {fname}: {e}", exc_info=True)
+        return f"Error in AI processing: {e}"
+
+def _normalize_extracted_fields(fname, content, extracted_data, document_classifier, date_normalizer):
+    """
+    Normalize one document's LLM-extracted fields by document type and
+    date format and return them as a formatted JSON string
+    """
+    # Detect document type from content and filename
+    doc_type = document_classifier.detect_document_type(content, fname)
+    logging.info(f"[EXTRACT] Detected document type for {fname}: {doc_type}")
+    
+    # Apply document-type based field normalization
+    normalized_data = document_classifier.normalize_fields(extracted_data, doc_type)
+    
+    # Apply date normalization to the fields
+    final_data = date_normalizer.process_data_object(normalized_data)
+    logging.info(f"[EXTRACT] Processed extraction for {fname}")
+    # Convert back to formatted JSON string
+    return json.dumps(final_data, indent=4)
+
+def _batch_section(fname, content):
+    """
+    One document's section in a batched extraction prompt
+    """
+    return f"\n=== Document: {fname} ===\n{content}\n"
+
+def _batch_prompt(documents):
+    """
+    Build a single extraction prompt for several (filename, text) documents
+    """
+    schema = EXTRACTION_SCHEMA
+    sections = ''.join(_batch_section(fname, content) for fname, content in documents)
+    return f'''
+You are an expert assistant helping to process evidence for a funeral expenses claim. The following is the application schema:
+{schema}
+
+Below are several evidence documents from the same claim, each in its own section headed by its filename. Read each document's text and extract all information relevant to the claim from that document alone. The text comes from OCR and may be incomplete or have errors.
+
+For each field you can extract from a document, provide:
+- The field name (from the schema above)
+- The value
+- A short explanation of your reasoning or the evidence source
+
+{EXTRACTION_GUIDANCE}
+
+CRITICAL: Each document's filename provides important clues about its document type. Analyze it carefully.
+
+If you can see a document is a specific type (e.g., "death certificate", "funeral bill", etc.) but can't extract specific fields, at least return a "_fileType" field for it.
+
+Return your answer as a JSON object whose keys are the document filenames exactly as written in the section headers. Each value is that document's own JSON object, where each key is a field name, and each value is an object with 'value' and 'reasoning'.
+
+Evidence documents:
+{sections}'''
+
+def _extract_fields_from_documents(documents, llm, document_classifier, date_normalizer):
+    """
+    Extract claim fields from one or more (filename, text) documents and
+    return {filename: result}. Several documents share one LLM call; any
+    document the batched response does not cover is retried on its own.
+    """
+    if len(documents) == 1:
+        fname, content = documents[0]
+        return {fname: _extract_fields_from_text(fname, content, llm, document_classifier, date_normalizer)}
+    
+    fnames = [fname for fname, _ in documents]
+    batch_data = {}
+    try:
+        response = llm.invoke(_batch_prompt(documents))
+        raw_response = str(response.content) if hasattr(response, 'content') else str(response)
+        batch_data = json.loads(raw_response)
+        if not isinstance(batch_data, dict):
+            raise ValueError(f"expected a JSON object, got {type(batch_data).__name__}")
+        logging.info(f"[EXTRACT] Batched extraction returned results for {len(batch_data)} of {len(documents)} documents")
+    except (json.JSONDecodeError, ValueError) as e:
+        logging.error(f"[EXTRACT] Failed to parse batched LLM response for {fnames}: {e}")
+        batch_data = {}
+    except Exception as e:
+        logging.error(f"[EXTRACT ERROR] Batched LLM invocation error for {fnames}: {e}", exc_info=True)
+        batch_data = {}
+    
+    results = {}
+    for fname, content in documents:
+        extracted_data = batch_data.get(fname)
+        if isinstance(extracted_data, dict):
+            results[fname] = _normalize_extracted_fields(fname, content, extracted_data, document_classifier, date_normalizer)
+        else:
+            logging.warning(f"[EXTRACT] No batched result for {fname}, extracting it on its own")
+            results[fname] = _extract_fields_from_text(fname, content, llm, document_classifier, date_normalizer)
+    return results
+
+def extract_evidence(requested_files, on_result=None):
+    """
+    Extract form data from evidence files in the shared evidence directory
+    (all files when none are requested) and return {filename: result} in
+    request order.
+    
+    Files are pipelined: OCR runs in the document processor's worker
+    processes, and LLM extraction starts on the extraction thread pool as
+    soon as text is ready, so OCR and LLM latency overlap across files.
+    Unless EXTRACT_BATCH_LLM is false, documents whose OCR finishes together
+    are packed into token-budgeted batches that share one LLM call; a batch
+    is sent as soon as OCR has nothing else ready, so no document waits on
+    files still being OCRed, and a document that does not fit a batch is
+    sent on its own. on_result(filename, result) is called as
+    each file's result becomes final. Raises FileNotFoundError if the
+    evidence directory is missing.
+    """
+    docs_dir = EVIDENCE_DIR
+    evidence_index = get_evidence_index()
+    
+    # Check if directory exists (this also picks up any new files)
+    if not evidence_index.refresh():
+        logging.error(f"[EXTRACT] Evidence directory does not exist: {docs_dir}")
+        raise FileNotFoundError(f"Evidence directory not found: {docs_dir}")
+    logging.info(f"[EXTRACT] Evidence directory {docs_dir} holds {len(evidence_index)} entries")
+    
+    extracted = {}
+    
+    components = get_extraction_components()
+    document_classifier = components.document_classifier
+    date_normalizer = components.date_normalizer
+    llm = components.llm
+    
+    # Process all files in the directory if no specific files requested
+    file_list = requested_files if requested_files else evidence_index.names()
+    
+    results = {}
+    
+    def finish(fname, result):
+        results[fname] = result
+        if on_result is not None:
+            on_result(fname, result)
+    
+    # Resolve every file first so OCR can start on all of them at once
+    fnames_by_path = {}
+    for fname in file_list:
+        file_path = evidence_index.resolve(fname)
+        if file_path is None:
+            logging.warning(f"[EXTRACT] File not found: {fname}")
+            finish(fname, "Error: File not found")
+            continue
+        if not os.path.isfile(file_path):
+            logging.warning(f"[EXTRACT] Not a file: {file_path}")
+            continue
+        logging.info(f"[EXTRACT] Processing file: {file_path}")
+        fnames_by_path.setdefault(file_path, []).append(fname)
+    
+    if llm is None:
+        logging.error("[EXTRACT] OpenAI API key not available for LLM invocation")
+    
+    batcher = None
+    if llm is not None and EXTRACT_BATCH_ENABLED:
+        batcher = DocumentBatcher(
+            EXTRACT_MODEL,
+            base_tokens=count_tokens(_batch_prompt([]), EXTRACT_MODEL),
+            section_tokens=count_tokens(_batch_section('', ''), EXTRACT_MODEL),
+            context_tokens=EXTRACT_CONTEXT_TOKENS,
+            output_tokens_per_document=EXTRACT_OUTPUT_TOKENS_PER_DOCUMENT,
+            max_output_tokens=EXTRACT_MAX_OUTPUT_TOKENS
+        )
+    
+    # Each LLM future maps to the files it extracts
+    llm_futures = {}
+    submitted = set()
+    executor = get_extract_executor()
+    
+    def submit(documents):
+        future = executor.submit(_extract_fields_from_documents, documents, llm, document_classifier, date_normalizer)
+        llm_futures[future] = [fname for fname, _ in documents]
+    
+    def flush_batch():
+        batch = batcher.flush()
+        if batch:
+            submit(batch)
+    
+    try:
+        for file_path, processing_result in components.document_processor.iter_process_files(
+                list(fnames_by_path), on_idle=flush_batch if batcher is not None else None):
+            for fname in fnames_by_path[file_path]:
+                if not processing_result.get("success", False):
+                    logging.error(f"[EXTRACT] Document processing failed: {processing_result.get('error')}")
+                    finish(fname, f"Error: Document processing failed: {processing_result.get('error')}")
+                    continue
                 
-                extracted[fname] = json.dumps({
-                    "_error": {
-                        "value": "AI service unavailable - API key missing",
-                        "reasoning": "The OpenAI API key is not configured. Please check server configuration."
-                    },
-                    "_fileType": {
-                        "value": doc_type_display,
-                        "reasoning": "Detected from document content and filename patterns"
-                    }
-                })
-                continue
+                content = processing_result.get("text", "")
+                logging.info(f"[EXTRACT] Successfully extracted {len(content)} characters from document")
                 
-            llm = ChatOpenAI(
-                model_name="gpt-3.5-turbo",
-                temperature=0.0,
-                openai_api_key=openai_key
-            )
-            
-            try:
-                # Get AI extraction response
-                response = llm.invoke(prompt)
-                raw_response = str(response.content) if hasattr(response, 'content') else str(response)
+                # Check if we actually got any meaningful content - VERY MINIMAL CHECK
+                # Even just a few characters might contain useful info when OCR fails partially
+                if not content:  # Only filter out completely empty text
+                    logging.warning(f"[EXTRACT] Insufficient text content extracted from {fname}: '{content}'")
+                    # Return a warning in a standardized JSON format instead of an error
+                    finish(fname, _no_text_result(fname, document_classifier))
+                    continue
                 
-                # Parse the extracted JSON data
-                try:
-                    # Convert the raw string response to Python dict
-                    extracted_data = json.loads(raw_response)
-                    
-                    # Detect document type from content and filename
-                    doc_type = document_classifier.detect_document_type(content, fname)
-                    logging.info(f"[EXTRACT] Detected document type for {fname}: {doc_type}")
-                    
-                    # Apply document-type based field normalization
-                    normalized_data = document_classifier.normalize_fields(extracted_data, doc_type)
-                    
-                    # Apply date normalization to the fields
-                    final_data = date_normalizer.process_data_object(normalized_data)                    # Convert back to formatted JSON string
-                    extracted[fname] = json.dumps(final_data, indent=4)
-                    logging.info(f"[EXTRACT] Processed extraction for {fname}")
-                except json.JSONDecodeError:
-                    # If JSON parsing fails, return the raw response
-                    logging.error(f"[EXTRACT] Failed to parse JSON from LLM response for {fname}")
-                    extracted[fname] = raw_response
-            except Exception as e:
-                logging.error(f"[EXTRACT ERROR] LLM invocation error for {fname}: {e}", exc_info=True)
-                extracted[fname] = f"Error in AI processing: {e}"
+                submitted.add(fname)
+                if batcher is None:
+                    submit([(fname, content)])
+                else:
+                    for batch in batcher.add(fname, content):
+                        submit(batch)
+    except Exception as e:
+        logging.error(f"[EXTRACT ERROR] Document processing failed: {e}", exc_info=True)
+        for fnames in fnames_by_path.values():
+            for fname in fnames:
+                if fname not in results and fname not in submitted:
+                    finish(fname, f"Error extracting: {e}")
+    
+    if batcher is not None:
+        flush_batch()
+    
+    for future in as_completed(llm_futures):
+        try:
+            for fname, result in future.result().items():
+                finish(fname, result)
         except Exception as e:
-            logging.error(f"[EXTRACT ERROR] {fname}: {e}", exc_info=True)
-            extracted[fname] = f"Error extracting: {e}"
+            logging.error(f"[EXTRACT ERROR] {llm_futures[future]}: {e}", exc_info=True)
+            for fname in llm_futures[future]:
+                finish(fname, f"Error extracting: {e}")
     
-    return jsonify(extracted)
+    # Merge per-file results in the original order
+    for fname in file_list:
+        if fname in results:
+            extracted[fname] = results[fname]
+    
+    return extracted
+
+
+@app.route('/ai-agent/extract-form-data', methods=['POST'])
+def extract_form_data():
+    """
+    Endpoint to extract data from evidence documents for form auto-filling.
+    Large bundles should use the /ai-agent/extract-jobs API instead, which
+    returns at once and reports progress.
+    """
+    # Get the list of files from the request, if provided
+    requested_files = []
+    if request.json and 'files' in request.json:
+        requested_files = request.json.get('files', [])
+        logging.info(f"[EXTRACT] Processing requested files: {requested_files}")
+    
+    try:
+        return jsonify(extract_evidence(requested_files))
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)})
+
+# Background extraction jobs, created on first use
+_extraction_jobs = None
+_extraction_jobs_lock = threading.Lock()
+
+def get_extraction_jobs():
+    """Get or create the extraction job manager"""
+    global _extraction_jobs
+    with _extraction_jobs_lock:
+        if _extraction_jobs is None:
+            _extraction_jobs = ExtractionJobManager(
+                ExtractionJobStore(),
+                extract_evidence,
+                max_workers=int(os.getenv('EXTRACT_JOB_WORKERS', '2'))
+            )
+        return _extraction_jobs
+
+@app.route('/ai-agent/extract-jobs', methods=['POST'])
+def create_extract_job():
+    """
+    Start an asynchronous extraction job and return its id at once. Accepts
+    the same "files" list as /ai-agent/extract-form-data and an optional
+    "callbackUrl" that receives the finished job as a JSON POST; its host
+    must be listed in EXTRACT_CALLBACK_ALLOWED_HOSTS.
+    """
+    payload = request.get_json(silent=True) or {}
+    requested_files = payload.get('files') or []
+    callback_url = payload.get('callbackUrl')
+    if callback_url and not callback_allowed(callback_url):
+        logging.warning(f"[EXTRACT-JOBS] Rejected callback URL {callback_url}")
+        return jsonify({"error": "callbackUrl must be an http(s) URL on an allowed host"}), 400
+    evidence_index = get_evidence_index()
+    if not evidence_index.refresh():
+        logging.error(f"[EXTRACT] Evidence directory does not exist: {EVIDENCE_DIR}")
+        return jsonify({"error": f"Evidence directory not found: {EVIDENCE_DIR}"}), 404
+    
+    # Fix the file list now so progress has a known total
+    file_list = requested_files if requested_files else evidence_index.names()
+    job_id = get_extraction_jobs().submit(file_list, callback_url)
+    return jsonify({
+        "jobId": job_id,
+        "status": "queued",
+        "statusUrl": url_for('get_extract_job', job_id=job_id)
+    }), 202
+
+@app.route('/ai-agent/extract-jobs/<job_id>', methods=['GET'])
+def get_extract_job(job_id):
+    """
+    Report an extraction job's status, per-file progress and the results
+    of the files finished so far
+    """
+    job = get_extraction_jobs().store.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown extraction job: {job_id}"}), 404
+    job.pop("callbackUrl", None)
+    return jsonify(job)
 
 @app.route('/ai-agent/test-evidence', methods=['GET'])
 def test_evidence():
@@ -2599,5 +2866,11 @@ if __name__ == '__main__':
     # Load RAG database on startup
     load_rag_database()
     
+    # Build extraction components and resume extraction jobs interrupted by
+    # a restart; under the debug reloader only the serving child process does
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        get_extraction_components()
+        get_extraction_jobs().resume()
+    
     # Start Flask app
     app.run(host='0.0.0.0', port=5050, debug=True)
@@ -0,0 +1,119 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), 'ocr_cache')
+
+class OcrCache:
+    """
+    Persistent OCR result cache keyed by file content hash and OCR config version.
+
+    Results live in a single SQLite database so every Flask worker shares them.
+    When the stored text exceeds max_bytes, the least recently used entries are
+    evicted.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir or os.getenv('OCR_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.db_path = os.path.join(self.cache_dir, 'ocr_cache.sqlite3')
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS ocr_results ('
+                ' key TEXT PRIMARY KEY,'
+                ' result TEXT NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON ocr_results (last_access)')
+        logging.info(f"[OCR-CACHE] Using OCR cache at {self.db_path}")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @staticmethod
+    def hash_file(file_path):
+        """
+        Return the SHA-256 hex digest of a file's contents. Also accepts a
+        seekable binary stream, which is rewound afterwards.
+        """
+        digest = hashlib.sha256()
+        if hasattr(file_path, 'read'):
+            for chunk in iter(lambda: file_path.read(1024 * 1024), b''):
+                digest.update(chunk)
+            file_path.seek(0)
+            return digest.hexdigest()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(content_hash, version):
+        return f"{version}:{content_hash}"
+
+    def get(self, key):
+        """
+        Return the cached result for key, or None on a miss
+        """
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT result FROM ocr_results WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute('UPDATE ocr_results SET last_access = ? WHERE key = ?', (time.time(), key))
+                return row[0]
+        except sqlite3.Error as e:
+            logging.warning(f"[OCR-CACHE] Lookup failed: {e}")
+            return None
+
+    def put(self, key, result):
+        """
+        Store a result and evict least recently used entries if over budget
+        """
+        size = len(result.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO ocr_results (key, result, size, last_access) VALUES (?, ?, ?, ?)',
+                    (key, result, size, time.time())
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logging.warning(f"[OCR-CACHE] Store failed: {e}")
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM ocr_results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute('SELECT key, size FROM ocr_results ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM ocr_results WHERE key = ?', (key,))
+            total -= size
+            evicted += 1
+        logging.info(f"[OCR-CACHE] Evicted {evicted} entries, cache now {total} bytes")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_ocr_cache(max_bytes=None):
+    """
+    Return the process-wide OCR cache, creating it on first use
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if max_bytes is None:
+                _cache = OcrCache()
+            else:
+                _cache = OcrCache(max_bytes=max_bytes)
+        return _cache
@@ -8,186 +8,1080 @@ from pypdf import PdfReader
 import docx2txt
 import re
 import logging
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import json
+import hashlib
+import shlex
+import shutil
+import subprocess
+from contextlib import contextmanager
+import ocr_cache
+import layout_templates
+import document_formats
+from ocr_words import OcrWords
+from document_classifier import DocumentClassifier
+
+# Config passes run concurrently (as tesseract processes or tesserocr threads),
+# so stop each one from also spawning an OpenMP thread per core and
+# oversubscribing the CPU. Set before tesserocr loads libtesseract.
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+try:
+    import numpy as np
+except ImportError:  # NumPy preprocessing is optional; the PIL variants still work
+    np = None
+
+try:
+    import tesserocr
+except ImportError:  # Falls back to spawning the tesseract CLI through pytesseract
+    tesserocr = None
+
+try:
+    import pillow_heif
+    pillow_heif.register_heif_opener()
+except ImportError:  # HEIC photos are then reported as unsupported
+    pillow_heif = None
 
 # OCR Configuration
 OCR_CONFIG = {
+    'version': 15, # Bump whenever a change alters OCR output so cached results are invalidated
     'lang': 'eng', # Language setting - can be expanded for multiple languages
+    'engine': os.getenv('OCR_ENGINE', 'auto'), # 'tesserocr', 'pytesseract', or 'auto' (tesserocr when installed)
     'config': '--psm 3 --oem 1', # Using more robust PSM 3 (auto page segmentation) and OEM 1 (LSTM only)
-    'dpi': 400 # Higher DPI for better quality
+    'dpi': 400, # Higher DPI for better quality; PDF pages are only rendered at this DPI when the coarse pass is unconfident
+    'coarse_dpi': 200, # First-pass DPI for rendering PDF pages
+    'upscale_min_side': 1200, # Small images are only upscaled to this size when the first pass is unconfident
+    'confidence_threshold': 80, # Stop trying configs once a pass reaches this mean word confidence (0-100)
+    'min_text_length': 50, # A pass must also produce at least this many characters to stop early
+    'max_attempts': 8, # Upper bound on Tesseract passes per document, across all preprocessing variants
+    'max_seconds': 120, # Wall-clock budget per document; no new passes start once it is spent
+    'max_cpu_seconds': 240, # OCR CPU budget per document: thread CPU time of its tesserocr passes (pytesseract passes are not measured)
+    'max_workers': os.cpu_count() or 1, # Concurrent Tesseract processes when trying several configs
+    'cache_enabled': os.getenv('OCR_CACHE_ENABLED', 'true').lower() != 'false', # Reuse results for identical files
+    'cache_max_bytes': 256 * 1024 * 1024, # Size bound for the on-disk OCR cache
+    'page_window': 2, # PDF pages rendered and held in memory at once
+    'text_layer_min_chars': 50, # PDF pages with less embedded text than this are OCRed instead
+    'numpy_preprocessing': os.getenv('OCR_NUMPY_PREPROCESSING', 'false').lower() == 'true', # Try the NumPy Sauvola variant first; opt-in until it beats the PIL chains on word confidence
+    'sauvola_k': 0.2, # Sauvola sensitivity; higher values make the threshold stricter
+    'max_skew_degrees': 5.0, # Largest skew angle the projection-profile estimator searches
+    'auto_orient': True, # Detect page rotation (Tesseract OSD) and skew once, before any recognition pass
+    'osd_min_confidence': 2.0, # Only rotate when OSD is at least this confident
+    'roi_ocr': os.getenv('OCR_ROI_ENABLED', 'false').lower() == 'true', # OCR only template field regions for known layouts
+    'roi_classify_size': 600, # Longest side of the low-resolution copy used to classify the document
+    'spool_max_bytes': 16 * 1024 * 1024 # Streamed documents stay in memory up to this size before spooling to disk
 }
 
+# Settings that do not change OCR output and so should not invalidate the cache
+_CACHE_NEUTRAL_SETTINGS = ('max_workers', 'cache_enabled', 'cache_max_bytes', 'page_window', 'max_seconds', 'engine',
+                           'spool_max_bytes', 'max_cpu_seconds')
+
+def ocr_config_version():
+    """
+    Return a version string covering every setting that affects OCR output
+    """
+    settings = {k: v for k, v in OCR_CONFIG.items() if k not in _CACHE_NEUTRAL_SETTINGS}
+    digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return f"v{OCR_CONFIG['version']}-{digest}"
+
 # Tesseract tuning parameters - updated for better results
-custom_config = r'--oem 1 --psm 3 -c tessedit_char_whitelist="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789,.;:?!@#$%^&*()-_+=<>[]{}|/\\ " -c textord_min_linesize=1.5'
+custom_config = r'--oem 1 --psm 3 -c tessedit_char_whitelist="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789,.;:?!@#$%^&*()-_+=<>[]{}|£€/\\ " -c textord_min_linesize=1.5'
 
-def preprocess_image(image, image_path=None):
+# Number of times each config has produced the winning result in this process.
+# Used to try historically successful configs first so the search can stop early.
+_config_wins = {}
+
+def _ordered_configs(configs):
     """
-    Preprocess the image to improve OCR accuracy
+    Order configs by how often they have won previous searches (stable for ties)
+    """
+    return sorted(configs, key=lambda config: -_config_wins.get(config, 0))
+
+def _record_config_win(config):
+    _config_wins[config] = _config_wins.get(config, 0) + 1
+
+# Shared pools for fanning OCR work out. Threads are enough here because the
+# work happens in tesseract/pdftoppm subprocesses or inside tesserocr, which
+# releases the GIL while recognising, not in Python. Config passes
+# and PDF pages use separate pools so a page task waiting on its config passes
+# can never starve them of workers.
+_executors = {}
+_executors_lock = threading.Lock()
+
+def _get_executor(name):
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(
+                max_workers=max(1, OCR_CONFIG['max_workers']),
+                thread_name_prefix=f'ocr-{name}'
+            )
+        return _executors[name]
+
+def _reset_executors_after_fork():
+    # A forked batch worker inherits the pool objects but not their threads
+    global _executors, _executors_lock
+    _executors = {}
+    _executors_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_executors_after_fork)
+
+def _run_passes_concurrently(passes, budget=None):
+    """
+    Run one OCR pass per (image, config) concurrently and return
+    [(config, text, confidence, words, error)] in the order the passes were given.
+    With a budget, each pass is bounded by the time the budget has left.
+    """
+    if len(passes) == 1:
+        futures = None
+    else:
+        executor = _get_executor('configs')
+        futures = [executor.submit(ocr_pass, image, config, budget) for image, config in passes]
+    results = []
+    for i, (image, config) in enumerate(passes):
+        try:
+            if futures is None:
+                text, confidence, words = ocr_pass(image, config, budget)
+            else:
+                text, confidence, words = futures[i].result()
+            results.append((config, text, confidence, words, None))
+        except Exception as e:
+            results.append((config, "", 0.0, OcrWords(), e))
+    return results
+
+def _run_configs_concurrently(image, configs, budget=None):
+    """
+    Run one OCR pass per config on the same image concurrently
+    """
+    return _run_passes_concurrently([(image, config) for config in configs], budget)
+
+class PytesseractEngine:
+    """
+    OCR backend that runs the tesseract CLI once per call via pytesseract
+    """
+    name = 'pytesseract'
+    
+    @staticmethod
+    def cpu_time():
+        """
+        None: tesseract runs in a child process that pytesseract reaps itself,
+        and RUSAGE_CHILDREN would mix in other documents' passes, so these
+        passes are not charged to the CPU budget
+        """
+        return None
+    
+    def image_to_data(self, image, config='', timeout=0):
+        # pytesseract kills tesseract and raises RuntimeError after timeout seconds (0 = no limit)
+        return pytesseract.image_to_data(
+            image,
+            lang=OCR_CONFIG['lang'],
+            config=config,
+            output_type=pytesseract.Output.DICT,
+            timeout=timeout
+        )
+    
+    def image_to_string(self, image, config='', timeout=0):
+        return pytesseract.image_to_string(image, lang=OCR_CONFIG['lang'], config=config, timeout=timeout)
+    
+    def detect_orientation(self, image, timeout=0):
+        """
+        Return (degrees to rotate clockwise to make text upright, confidence)
+        """
+        osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT, timeout=timeout)
+        return int(osd['rotate']), float(osd['orientation_conf'])
+
+class TesserocrEngine:
+    """
+    In-process OCR backend built on tesserocr.
+
+    Each worker thread keeps one initialised Tesseract API per (lang, oem),
+    so the model is loaded once per worker and images are passed as buffers
+    instead of temp files. Page segmentation mode, resolution and -c
+    variables are applied per call and the variables are reset afterwards.
+    """
+    name = 'tesserocr'
+    
+    def __init__(self):
+        self._local = threading.local()
+    
+    @staticmethod
+    def cpu_time():
+        """
+        CPU seconds used by the calling thread, which is where tesserocr
+        recognizes
+        """
+        return time.thread_time()
+    
+    @staticmethod
+    def can_start():
+        """
+        Check that a Tesseract API starts, i.e. tessdata and the configured
+        language are found. The import alone does not prove that.
+        """
+        try:
+            api = tesserocr.PyTessBaseAPI(lang=OCR_CONFIG['lang'])
+        except Exception as e:
+            logging.warning(f"[OCR] tesserocr could not start (lang={OCR_CONFIG['lang']}): {e}")
+            return False
+        api.End()
+        return True
+    
+    @staticmethod
+    def parse_config(config):
+        """
+        Parse a tesseract CLI config string into (lang, oem, psm, dpi, variables)
+        """
+        lang, oem, psm, dpi = OCR_CONFIG['lang'], tesserocr.OEM.DEFAULT, tesserocr.PSM.AUTO, None
+        variables = {}
+        args = shlex.split(config or '')
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            value = args[i + 1] if i + 1 < len(args) else None
+            if arg == '--psm':
+                psm = int(value)
+            elif arg == '--oem':
+                oem = int(value)
+            elif arg == '--dpi':
+                dpi = int(value)
+            elif arg == '-l':
+                lang = value
+            elif arg == '-c' and value and '=' in value:
+                name, var_value = value.split('=', 1)
+                variables[name] = var_value
+            else:
+                i += 1
+                continue
+            i += 2
+        return lang, oem, psm, dpi, variables
+    
+    def _api(self, lang, oem):
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = {}
+        if (lang, oem) not in apis:
+            logging.info(f"[OCR] Loading tesserocr model lang={lang} oem={oem} in {threading.current_thread().name}")
+            apis[(lang, oem)] = tesserocr.PyTessBaseAPI(lang=lang, oem=oem)
+        return apis[(lang, oem)]
+    
+    def _recognize(self, image, config, timeout=0):
+        lang, oem, psm, dpi, variables = self.parse_config(config)
+        api = self._api(lang, oem)
+        defaults = {name: api.GetVariableAsString(name) for name in variables}
+        try:
+            api.SetPageSegMode(psm)
+            for name, value in variables.items():
+                api.SetVariable(name, value)
+            api.SetImage(image)
+            if dpi:
+                api.SetSourceResolution(dpi)
+            # Recognize takes a timeout in milliseconds and returns False if it was hit
+            if not api.Recognize(int(timeout * 1000)):
+                raise RuntimeError('Tesseract process timeout')
+            return api
+        finally:
+            for name, value in defaults.items():
+                if value is not None:
+                    api.SetVariable(name, value)
+    
+    def image_to_data(self, image, config='', timeout=0):
+        """
+        Return word data in the same shape as pytesseract's Output.DICT
+        """
+        api = self._recognize(image, config, timeout)
+        data = {key: [] for key in ('text', 'conf', 'block_num', 'par_num', 'line_num',
+                                    'left', 'top', 'width', 'height')}
+        level = tesserocr.RIL.WORD
+        block_num = par_num = line_num = 0
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+        for word in tesserocr.iterate_level(iterator, level):
+            text = word.GetUTF8Text(level)
+            box = word.BoundingBox(level)
+            if text is None or box is None:
+                continue
+            if word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                block_num += 1
+                par_num = line_num = 0
+            if word.IsAtBeginningOf(tesserocr.RIL.PARA):
+                par_num += 1
+                line_num = 0
+            if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                line_num += 1
+            left, top, right, bottom = box
+            data['text'].append(text)
+            data['conf'].append(word.Confidence(level))
+            data['block_num'].append(block_num)
+            data['par_num'].append(par_num)
+            data['line_num'].append(line_num)
+            data['left'].append(left)
+            data['top'].append(top)
+            data['width'].append(right - left)
+            data['height'].append(bottom - top)
+        return data
+    
+    def image_to_string(self, image, config='', timeout=0):
+        return self._recognize(image, config, timeout).GetUTF8Text()
+    
+    def detect_orientation(self, image, timeout=0):
+        """
+        Return (degrees to rotate clockwise to make text upright, confidence)
+        """
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = {}
+        if 'osd' not in apis:
+            # OSD needs the legacy engine and the osd model
+            apis['osd'] = tesserocr.PyTessBaseAPI(
+                lang='osd', psm=tesserocr.PSM.OSD_ONLY, oem=tesserocr.OEM.TESSERACT_ONLY
+            )
+        api = apis['osd']
+        api.SetImage(image)
+        osd = api.DetectOrientationScript()
+        if not osd:
+            return 0, 0.0
+        # orient_deg is the current counter-clockwise orientation of the text
+        return (360 - osd['orient_deg']) % 360, float(osd['orient_conf'])
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_ocr_engine():
+    """
+    Return the process-wide OCR backend selected by OCR_CONFIG['engine']
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            choice = OCR_CONFIG['engine']
+            if choice == 'tesserocr' and tesserocr is None:
+                logging.warning("[OCR] tesserocr requested but not installed; using pytesseract")
+            if choice in ('auto', 'tesserocr') and tesserocr is not None and TesserocrEngine.can_start():
+                _engine = TesserocrEngine()
+            else:
+                _engine = PytesseractEngine()
+            logging.info(f"[OCR] Using {_engine.name} OCR engine")
+        return _engine
+
+def ocr_with_confidence(image, config='', timeout=0):
+    """
+    Run a single Tesseract pass and return (text, mean word confidence)
+    """
+    text, mean_conf, _ = ocr_with_words(image, config, timeout=timeout)
+    return text, mean_conf
+
+def ocr_pass(image, config='', budget=None, page=1):
+    """
+    Run ocr_with_words under a document's OcrBudget: the pass gets what is
+    left of the wall-clock budget as its Tesseract timeout and, where the
+    engine can measure it, the CPU time it used is charged to the budget.
+    Raises once the budget is spent.
+    """
+    if budget is None:
+        return ocr_with_words(image, config, page)
+    if budget.expired():
+        budget.truncated = True
+        raise TimeoutError("OCR budget for this document is spent")
+    engine = get_ocr_engine()
+    started = engine.cpu_time()
+    try:
+        return ocr_with_words(image, config, page, budget.remaining_seconds())
+    except Exception as e:
+        budget.record_error(e)
+        if budget.expired():
+            budget.truncated = True
+        raise
+    finally:
+        if started is not None:
+            budget.add_cpu(engine.cpu_time() - started)
+
+def ocr_with_words(image, config='', page=1, timeout=0):
+    """
+    Run a single Tesseract pass and return (text, mean word confidence, OcrWords).
+
+    Uses image_to_data so the text, the per-word confidences and the word boxes
+    come from the same pass. Lines are rebuilt from the block/paragraph/line numbers.
+    """
+    data = get_ocr_engine().image_to_data(image, config, timeout)
+    words = OcrWords()
+    lines = []
+    current_key = None
+    current_par = None
+    for i, word in enumerate(data['text']):
+        word = (word or '').strip()
+        conf = float(data['conf'][i])
+        if not word or conf < 0:
+            continue
+        words.append(word, conf, int(data['left'][i]), int(data['top'][i]),
+                     int(data['width'][i]), int(data['height'][i]), page)
+        par_key = (data['block_num'][i], data['par_num'][i])
+        line_key = par_key + (data['line_num'][i],)
+        if line_key != current_key:
+            if current_par is not None and par_key != current_par:
+                lines.append('')
+            lines.append(word)
+            current_key = line_key
+            current_par = par_key
+        else:
+            lines[-1] += ' ' + word
+    text = '\n'.join(lines)
+    return text, words.mean_confidence(), words
+
+def _is_png(image_path):
+    if not image_path:
+        return False
+    _, ext = os.path.splitext(image_path)
+    return ext.lower() == '.png'
+
+def _scan_variant_aggressive(image):
+    """
+    Strong unsharp mask and contrast for faint scans
     """
     from PIL import ImageEnhance, ImageFilter
+    image = image.filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3))
+    image = ImageEnhance.Contrast(image).enhance(3.0)  # Higher contrast for scanned docs
+    image = image.filter(ImageFilter.SHARPEN)
+    return image.filter(ImageFilter.MedianFilter(size=3))
+
+def _scan_variant_mild(image):
+    """
+    Less aggressive contrast enhancement
+    """
+    from PIL import ImageEnhance, ImageFilter
+    image = ImageEnhance.Contrast(image).enhance(1.8)
+    return image.filter(ImageFilter.SHARPEN)
+
+def _scan_variant_sharpen(image):
+    """
+    Simple double sharpening
+    """
+    from PIL import ImageFilter
+    return image.filter(ImageFilter.SHARPEN).filter(ImageFilter.SHARPEN)
+
+def _standard_variant(image):
+    """
+    Standard preprocessing for photos and non-PNG scans
+    """
+    from PIL import ImageEnhance, ImageFilter
+    image = image.filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3))
+    
+    # Enhance contrast - this helps with scanned documents
+    image = ImageEnhance.Contrast(image).enhance(2.5)  # Increased contrast for better OCR
+    
+    # Additional sharpening for text clarity
+    image = image.filter(ImageFilter.SHARPEN)
+    image = image.filter(ImageFilter.SHARPEN)  # Apply twice for better effect
+    
+    # Apply additional noise reduction
+    return image.filter(ImageFilter.MedianFilter(size=3))
+
+# Rows thresholded at a time, so the float temporaries stay a few MB
+# whatever the page size
+SAUVOLA_BAND_ROWS = 256
+
+def _box_mean(padded, window):
+    """
+    Mean over a window x window box around each pixel, via an integral image.
+    `padded` carries window // 2 extra rows and columns on every side; the
+    result has the unpadded shape.
+    """
+    h = padded.shape[0] - window + 1
+    w = padded.shape[1] - window + 1
+    integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1))
+    np.cumsum(padded, axis=0, out=integral[1:, 1:])
+    np.cumsum(integral[1:, 1:], axis=1, out=integral[1:, 1:])
+    total = integral[window:window + h, window:window + w] - integral[:h, window:window + w]
+    total -= integral[window:window + h, :w]
+    total += integral[:h, :w]
+    total /= window * window
+    return total
+
+def sauvola_threshold(gray, window=None, k=None):
+    """
+    Binarize a grayscale array with Sauvola local thresholding.
+    Returns a boolean array that is True for ink pixels.
     
+    The page is thresholded in bands of SAUVOLA_BAND_ROWS rows, so besides
+    the mask only one band's float statistics are held at a time.
+    """
+    k = OCR_CONFIG['sauvola_k'] if k is None else k
+    if window is None:
+        # Roughly a couple of text lines high, and always odd
+        window = max(15, (min(gray.shape) // 40) | 1)
+    pad = window // 2
+    h = gray.shape[0]
+    ink = np.empty(gray.shape, dtype=bool)
+    for top in range(0, h, SAUVOLA_BAND_ROWS):
+        bottom = min(h, top + SAUVOLA_BAND_ROWS)
+        # The rows the band's windows reach, edge-padded at the page edges
+        low, high = max(0, top - pad), min(h, bottom + pad)
+        block = np.pad(gray[low:high], ((pad - (top - low), pad - (high - bottom)), (pad, pad)),
+                       mode='edge').astype(np.float64)
+        mean = _box_mean(block, window)
+        np.square(block, out=block)
+        std = _box_mean(block, window)
+        del block
+        std -= mean * mean
+        np.sqrt(np.maximum(std, 0, out=std), out=std)
+        # T = m * (1 + k * (s / R - 1)) with R = 128 for 8-bit images
+        std *= k / 128.0
+        std += 1.0 - k
+        std *= mean
+        np.less(gray[top:bottom], std, out=ink[top:bottom])
+    return ink
+
+def estimate_skew(ink, max_degrees=None, step=0.25):
+    """
+    Estimate text skew in degrees from a boolean ink mask using projection
+    profiles: the angle whose sheared row histogram is sharpest wins.
+    """
+    max_degrees = OCR_CONFIG['max_skew_degrees'] if max_degrees is None else max_degrees
+    # Subsample so large scans stay cheap; the angle is unaffected
+    stride = max(1, max(ink.shape) // 1000)
+    ys, xs = np.nonzero(ink[::stride, ::stride])
+    if len(ys) < 100:
+        return 0.0
+    best_angle, best_score = 0.0, -1.0
+    height = ink.shape[0] // stride
+    for angle in np.arange(-max_degrees, max_degrees + step / 2, step):
+        rows = np.round(ys - xs * np.tan(np.radians(angle))).astype(np.int64)
+        rows -= rows.min()
+        profile = np.bincount(rows, minlength=height)
+        score = float(np.dot(profile, profile))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+def _crop_borders(ink, margin=10):
+    """
+    Return (top, bottom, left, right) bounds that drop dark scanner borders
+    and blank margins around the ink
+    """
+    h, w = ink.shape
+    row_ink = ink.mean(axis=1)
+    col_ink = ink.mean(axis=0)
+    # Rows/columns that are mostly ink at the edges are scanner borders, not text
+    top, bottom, left, right = 0, h, 0, w
+    while top < bottom - 1 and row_ink[top] > 0.5:
+        top += 1
+    while bottom > top + 1 and row_ink[bottom - 1] > 0.5:
+        bottom -= 1
+    while left < right - 1 and col_ink[left] > 0.5:
+        left += 1
+    while right > left + 1 and col_ink[right - 1] > 0.5:
+        right -= 1
+    rows = np.nonzero(row_ink[top:bottom])[0]
+    cols = np.nonzero(col_ink[left:right])[0]
+    if len(rows) == 0 or len(cols) == 0:
+        return 0, h, 0, w
+    return (max(0, top + rows[0] - margin), min(h, top + rows[-1] + 1 + margin),
+            max(0, left + cols[0] - margin), min(w, left + cols[-1] + 1 + margin))
+
+def _sauvola_variant(image):
+    """
+    NumPy preprocessing: grayscale, banded Sauvola binarization and border
+    crop. Skew is already corrected by correct_orientation.
+    """
+    gray = np.asarray(image.convert('L') if image.mode != 'L' else image, dtype=np.uint8)
+    ink = sauvola_threshold(gray)
+    del gray
+    top, bottom, left, right = _crop_borders(ink)
+    ink = ink[top:bottom, left:right]
+    # Tesseract expects dark text on a light background
+    processed = Image.fromarray(np.where(ink, np.uint8(0), np.uint8(255)), mode='L')
+    processed.info['ocr_origin'] = (int(left), int(top))
+    return processed
+
+def correct_orientation(image, budget=None):
+    """
+    Rotate an image so its text is upright and level before recognition.
+
+    Page rotation (0/90/180/270) comes from a single Tesseract OSD pass and
+    small skew from the projection-profile estimator on a reduced copy.
+    Returns the original image when nothing needs correcting.
+    """
+    if not OCR_CONFIG['auto_orient'] or (budget is not None and budget.expired()):
+        return image
+    engine = get_ocr_engine()
+    started = engine.cpu_time()
     try:
-        # Check if it's a PNG file for special processing
-        is_png = False
-        if image_path:
-            _, ext = os.path.splitext(image_path)
-            is_png = ext.lower() == '.png'
-        
-        # Convert to grayscale
-        if image.mode != 'L':
-            image = image.convert('L')
-        
-        # Increase image DPI if it's too low
-        dpi = getattr(image, 'info', {}).get('dpi', (72, 72))
-        if isinstance(dpi, tuple) and len(dpi) >= 1 and dpi[0] < 300:
-            logging.info(f"[OCR] Low DPI image detected: {dpi}. Enhancing...")
-        
-        # Additional preprocessing for PNG files (likely scanned documents)
-        if is_png:
-            logging.info(f"[OCR] Using enhanced preprocessing for PNG file")
-            
-            # Special processing for scanned documents - try multiple approaches
-            processed_images = []
-            
-            # Approach 1: Binarization with adaptive thresholding
-            try:
-                img1 = image.copy()
-                img1 = img1.filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3))
-                enhancer = ImageEnhance.Contrast(img1)
-                img1 = enhancer.enhance(3.0)  # Higher contrast for scanned docs
-                img1 = img1.filter(ImageFilter.SHARPEN)
-                img1 = img1.filter(ImageFilter.MedianFilter(size=3))
-                processed_images.append(img1)
-            except Exception as e:
-                logging.error(f"[OCR] Preprocessing approach 1 failed: {e}")
-            
-            # Approach 2: Less aggressive contrast enhancement
-            try:
-                img2 = image.copy()
-                enhancer = ImageEnhance.Contrast(img2)
-                img2 = enhancer.enhance(1.8)
-                img2 = img2.filter(ImageFilter.SHARPEN)
-                processed_images.append(img2)
-            except Exception as e:
-                logging.error(f"[OCR] Preprocessing approach 2 failed: {e}")
-            
-            # Approach 3: Simple sharpening
-            try:
-                img3 = image.copy()
-                img3 = img3.filter(ImageFilter.SHARPEN)
-                img3 = img3.filter(ImageFilter.SHARPEN)
-                processed_images.append(img3)
-            except Exception as e:
-                logging.error(f"[OCR] Preprocessing approach 3 failed: {e}")
-            
-            # Return the first processed image, but we'll use all of them in extract_text_from_image
-            if processed_images:
-                logging.info(f"[OCR] Created {len(processed_images)} preprocessed versions for PNG")
-                return processed_images[0]
-        
-        # Standard preprocessing for other image types
-        # Binarize the image using adaptive thresholding
-        image = image.filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3))
-        
-        # Enhance contrast - this helps with scanned documents
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(2.5)  # Increased contrast for better OCR
-        
-        # Additional sharpening for text clarity
-        image = image.filter(ImageFilter.SHARPEN)
-        image = image.filter(ImageFilter.SHARPEN)  # Apply twice for better effect
-        
-        # Resize image if too small
-        if image.width < 1200 or image.height < 1200:
-            ratio = max(1200/image.width, 1200/image.height)
-            new_size = (int(image.width * ratio), int(image.height * ratio))
-            image = image.resize(new_size, Image.LANCZOS)
-        
-        # Apply additional noise reduction
-        image = image.filter(ImageFilter.MedianFilter(size=3))
-        
-        logging.info(f"[OCR] Image preprocessing complete. New size: {image.width}x{image.height}")
+        timeout = budget.remaining_seconds() if budget is not None else 0
+        rotate, confidence = engine.detect_orientation(image, timeout)
+        if rotate and confidence >= OCR_CONFIG['osd_min_confidence']:
+            logging.info(f"[OCR] Rotating page {rotate} degrees clockwise (OSD confidence {confidence:.1f})")
+            image = image.rotate(-rotate, expand=True)
+    except Exception as e:
+        # OSD fails on pages with too little text; carry on unrotated
+        logging.info(f"[OCR] Orientation detection skipped: {e}")
+    finally:
+        if budget is not None and started is not None:
+            budget.add_cpu(engine.cpu_time() - started)
+    
+    if np is None:
+        return image
+    try:
+        # Skew is scale-invariant, so estimate it on a reduced copy
+        sample = image.convert('L')
+        factor = max(1, max(sample.size) // 1000)
+        if factor > 1:
+            sample = sample.reduce(factor)
+        angle = estimate_skew(sauvola_threshold(np.asarray(sample, dtype=np.float32)))
+        if abs(angle) >= 0.25:
+            logging.info(f"[OCR] Deskewing by {angle:.2f} degrees")
+            fill = 255 if image.mode == 'L' else (255,) * len(image.getbands())
+            image = image.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=fill)
+    except Exception as e:
+        logging.warning(f"[OCR] Skew estimation failed: {e}")
+    return image
+
+def variant_origin(variant):
+    """
+    (left, top) of a preprocessing variant within the image it was built
+    from; non-zero when the variant cropped borders
+    """
+    return variant.info.get('ocr_origin', (0, 0))
+
+def _words_on_page(words, variant, scale=1.0):
+    """
+    Map word boxes from a preprocessing variant's pixels to page pixels:
+    undo the variant's border crop, then scale by `scale` page pixels per
+    pixel of the image the variant was built from
+    """
+    left, top = variant_origin(variant)
+    mapped = OcrWords()
+    mapped.extend(words, offset=(left * scale, top * scale), scale=scale)
+    return mapped
+
+def upscale_ratio(image):
+    """
+    Factor by which a small image would be enlarged for a full-resolution pass
+    """
+    min_side = OCR_CONFIG['upscale_min_side']
+    if image.width >= min_side and image.height >= min_side:
+        return 1.0
+    return max(min_side / image.width, min_side / image.height)
+
+def upscale_for_ocr(image):
+    """
+    Enlarge a small image so its text is big enough for Tesseract
+    """
+    ratio = upscale_ratio(image)
+    if ratio <= 1:
         return image
+    new_size = (int(image.width * ratio), int(image.height * ratio))
+    return image.resize(new_size, Image.LANCZOS)
+
+# Preprocessing variants in the order they are tried. PNG files are usually
+# scanned documents and get several enhancement approaches.
+SCAN_PREPROCESS_VARIANTS = [
+    ('scan_aggressive', _scan_variant_aggressive),
+    ('scan_mild', _scan_variant_mild),
+    ('scan_sharpen', _scan_variant_sharpen),
+]
+STANDARD_PREPROCESS_VARIANTS = [
+    ('standard', _standard_variant),
+]
+
+NUMPY_PREPROCESS_VARIANTS = [
+    ('sauvola', _sauvola_variant),
+]
+
+def preprocess_variants_for(image_path):
+    variants = SCAN_PREPROCESS_VARIANTS if _is_png(image_path) else STANDARD_PREPROCESS_VARIANTS
+    if np is not None and OCR_CONFIG['numpy_preprocessing']:
+        variants = NUMPY_PREPROCESS_VARIANTS + variants
+    return variants
+
+def iter_preprocessed_variants(image, image_path=None):
+    """
+    Lazily yield (name, image) preprocessing variants, best first.
+    Each variant is only computed when the caller asks for the next one.
+    """
+    # Convert to grayscale
+    if image.mode != 'L':
+        image = image.convert('L')
+    
+    dpi = getattr(image, 'info', {}).get('dpi', (72, 72))
+    if isinstance(dpi, tuple) and len(dpi) >= 1 and dpi[0] < 300:
+        logging.info(f"[OCR] Low DPI image detected: {dpi}")
+    
+    for name, variant in preprocess_variants_for(image_path):
+        try:
+            processed = variant(image)
+        except Exception as e:
+            logging.error(f"[OCR] Preprocessing variant {name} failed: {e}")
+            continue
+        logging.info(f"[OCR] Built {name} preprocessing variant: {processed.width}x{processed.height}")
+        yield name, processed
+
+def preprocess_image(image, image_path=None):
+    """
+    Preprocess the image to improve OCR accuracy, returning the first variant
+    """
+    try:
+        for _, processed in iter_preprocessed_variants(image, image_path):
+            return processed
     except Exception as e:
         logging.error(f"[OCR] Error in image preprocessing: {str(e)}", exc_info=True)
-        return image  # Return original image if preprocessing fails
+    return image  # Return original image if preprocessing fails
+
+# Tesseract configs tried for images, before priority ordering
+IMAGE_CONFIGS = [
+    '',  # Tesseract defaults
+    custom_config,
+    '--psm 4 --oem 1',  # Assume a single column of text with LSTM only
+    '--psm 3 --oem 1',  # Fully automatic page segmentation with LSTM only
+    '--psm 6 --oem 1',  # Assume a single uniform block of text with LSTM only
+    '--psm 11 --oem 1', # Sparse text - no specific orientation or spacing
+    '--psm 4 --oem 3',  # Assume a single column of text with LSTM + legacy
+    '--psm 3 --oem 3',  # Fully automatic page segmentation with LSTM + legacy
+]
 
-def extract_text_from_image(image_path):
+# Extra configs that work well with scanned documents, which usually arrive as PNG
+PNG_EXTRA_CONFIGS = [
+    '--psm 4 --oem 1 -c tessedit_char_whitelist="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789,.;:?!@#$%^&*()-_+=<>[]{}|£€/\\ "',  # Better for scanned text
+    '--psm 6 --oem 1 -c textord_min_linesize=1.5',  # Better for letter-type documents
+    '--psm 3 --oem 1 -l eng --dpi 300',  # Explicitly set higher DPI
+    '--psm 3 --oem 1 -c textord_heavy_nr=1 -c textord_really_old_xheight=1',  # Better for low quality scans
+]
+
+class OcrStats:
     """
-    Extract text from an image file using OCR
+    Per-document accounting of OCR work for the coarse-to-fine strategy.
+
+    Every pass records the pixels it processed and the pixels the same pass
+    would have processed at full resolution, so the time saved by coarse
+    passes can be estimated from the measured time per pixel.
+    """
+    def __init__(self):
+        self.started = time.monotonic()
+        self.passes = 0
+        self.pixels_processed = 0
+        self.pixels_full_resolution = 0
+        self.pages_refined = 0
+    
+    def record_pass(self, image, full_resolution_scale=1.0):
+        pixels = image.width * image.height
+        self.passes += 1
+        self.pixels_processed += pixels
+        self.pixels_full_resolution += int(pixels * full_resolution_scale * full_resolution_scale)
+    
+    def as_dict(self):
+        elapsed = time.monotonic() - self.started
+        saved_pixels = max(0, self.pixels_full_resolution - self.pixels_processed)
+        seconds_per_pixel = elapsed / self.pixels_processed if self.pixels_processed else 0.0
+        return {
+            "passes": self.passes,
+            "pixels_processed": self.pixels_processed,
+            "pixels_full_resolution": self.pixels_full_resolution,
+            "pages_refined": self.pages_refined,
+            "seconds": round(elapsed, 3),
+            "estimated_seconds_saved": round(saved_pixels * seconds_per_pixel, 3),
+        }
+
+class OcrBudget:
+    """
+    Per-document limits on Tesseract passes, wall-clock time and OCR CPU time.
+    The CPU budget only counts passes whose engine measures their CPU time
+    (tesserocr); it stops new passes but is never used as a pass timeout.
+    Also carries the document's OCR stats and the words of the OCR results it
+    kept. `truncated` is set when time or CPU ran out before the OCR strategy
+    finished, so the text is only the best result so far; `errors` holds the
+    exceptions of Tesseract passes that failed.
+    """
+    def __init__(self, max_attempts=None, max_seconds=None, max_cpu_seconds=None):
+        self.max_attempts = OCR_CONFIG['max_attempts'] if max_attempts is None else max_attempts
+        self.max_seconds = OCR_CONFIG['max_seconds'] if max_seconds is None else max_seconds
+        self.max_cpu_seconds = OCR_CONFIG['max_cpu_seconds'] if max_cpu_seconds is None else max_cpu_seconds
+        self.started = time.monotonic()
+        self.attempts = 0
+        self.cpu_seconds = 0.0
+        self.truncated = False
+        self.errors = []
+        self.stats = OcrStats()
+        self.words = OcrWords()
+        self._lock = threading.Lock()
+    
+    def remaining_attempts(self):
+        if self.expired():
+            return 0
+        return max(0, self.max_attempts - self.attempts)
+    
+    def remaining_seconds(self):
+        """
+        Seconds left of the wall-clock budget
+        """
+        return max(0.0, self.max_seconds - (time.monotonic() - self.started))
+    
+    def expired(self):
+        return self.remaining_seconds() <= 0 or self.cpu_seconds >= self.max_cpu_seconds
+    
+    def add_cpu(self, seconds):
+        # Passes run on pool threads, so charge them under a lock
+        with self._lock:
+            self.cpu_seconds += seconds
+    
+    def record_error(self, error):
+        with self._lock:
+            self.errors.append(error)
+    
+    def consume(self, attempts=1):
+        self.attempts += attempts
+
+class ImageOcrPlanner:
+    """
+    Runs the OCR strategy for one decoded image.
+
+    A plan is an iterable of (variant name, variant image, configs) steps,
+    usually a generator so a variant is only built when its step is reached.
+    Each (variant, config) pair is OCRed at most once, its result is kept
+    against the variant, and all passes draw from one OcrBudget.
+    """
+    def __init__(self, image, budget=None):
+        self.image = image
+        self.budget = budget or OcrBudget()
+        self.results = {}  # (variant, config) -> (text, confidence, words)
+        self.best = None   # (score, variant, config, text)
+        self.transforms = {}  # variant -> (offset, scale) mapping its pixels to the page
+    
+    def satisfied(self):
+        if self.best is None:
+            return False
+        text = self.best[3]
+        confidence = self.results[(self.best[1], self.best[2])][1]
+        return confidence >= OCR_CONFIG['confidence_threshold'] and len(text.strip()) >= OCR_CONFIG['min_text_length']
+    
+    def has_enough_text(self):
+        return self.best is not None and len(self.best[3].strip()) >= OCR_CONFIG['min_text_length']
+    
+    def run_step(self, name, image, configs, reserve=None, transform=None):
+        """
+        OCR one variant with configs in waves of max_workers passes, stopping
+        when the confidence threshold is met or the budget runs out. `reserve`
+        returns the attempts to keep back for later steps; it is asked again
+        before every wave, since what later steps need changes as results come in.
+        `transform` is the (offset, scale) that maps the variant's pixels to
+        the page, for word boxes.
+        """
+        if transform is not None:
+            self.transforms[name] = transform
+        pending = [config for config in configs if (name, config) not in self.results]
+        wave_size = max(1, OCR_CONFIG['max_workers'])
+        while pending and not self.satisfied():
+            held = reserve() if reserve is not None else 0
+            wave = pending[:max(0, min(wave_size, self.budget.remaining_attempts() - held))]
+            if not wave:
+                logging.info(f"[OCR] Budget for {name} image spent after {self.budget.attempts} attempts")
+                return
+            pending = pending[len(wave):]
+            self.budget.consume(len(wave))
+            for _ in wave:
+                self.budget.stats.record_pass(image, upscale_ratio(image))
+            for config, text, confidence, words, error in _run_configs_concurrently(image, wave, self.budget):
+                if error is not None:
+                    logging.error(f"[OCR] Error with config {config or 'default'} on {name} image: {error}")
+                    self.results[(name, config)] = ("", 0.0, words)
+                    continue
+                logging.info(f"[OCR] {name} image, config {(config or 'default')[:10]}... extracted {len(text)} chars, confidence {confidence:.1f}")
+                self.results[(name, config)] = (text, confidence, words)
+                # Rank by total word confidence so a long, fairly confident pass beats
+                # a short, very confident one
+                score = sum(words.conf)
+                if self.best is None or score > self.best[0]:
+                    self.best = (score, name, config, text)
+    
+    def best_config(self):
+        return self.best[2] if self.best else None
+    
+    def best_words(self):
+        """
+        Words of the best result, with boxes mapped to page pixels
+        """
+        words = OcrWords()
+        if self.best:
+            offset, scale = self.transforms.get(self.best[1], ((0, 0), 1.0))
+            words.extend(self.results[(self.best[1], self.best[2])][2], offset=offset, scale=scale)
+        return words
+    
+    def execute(self, plan):
+        """
+        Run plan steps in order until the confidence threshold is met. The plan
+        generator sees the planner's state and decides which fallback steps to
+        build; each step is (name, image, configs, reserve, transform) as for
+        run_step.
+        """
+        for name, image, configs, reserve, transform in plan:
+            if self.budget.expired():
+                break
+            self.run_step(name, image, configs, reserve, transform)
+            if self.satisfied():
+                logging.info(f"[OCR] Confidence threshold met after {self.budget.attempts} attempts")
+                break
+        if self.budget.expired() and not self.satisfied():
+            logging.warning(f"[OCR] Time budget spent after {self.budget.attempts} attempts; keeping the best result so far")
+            self.budget.truncated = True
+        if self.best is not None and self.best[3]:
+            _record_config_win(self.best[2])
+        return self.best[3] if self.best else ""
+    
+    def all_texts(self):
+        return [text for text, _, _ in self.results.values() if text]
+
+_classifier = None
+
+def _get_classifier():
+    global _classifier
+    if _classifier is None:
+        _classifier = DocumentClassifier()
+    return _classifier
+
+def extract_text_from_layout(image, filename, budget):
+    """
+    OCR only the field regions of a known document layout.
+
+    A cheap pass over a low-resolution copy classifies the document; if a
+    layout template exists for its type, each field region is cropped from
+    the full-resolution image and OCRed. Returns labelled field text, or
+    None when there is no template or too few regions produce text.
+    """
+    if budget.remaining_attempts() < 2:
+        return None
+    gray = image.convert('L')
+    sample = gray
+    factor = -(-max(gray.size) // OCR_CONFIG['roi_classify_size'])  # Ceiling division
+    if factor > 1:
+        sample = gray.reduce(factor)
+    budget.consume()
+    budget.stats.record_pass(sample, factor)
+    try:
+        coarse_text, _, _ = ocr_pass(sample, '--psm 3 --oem 1', budget)
+        doc_type = _get_classifier().detect_document_type(coarse_text, filename)
+    except Exception as e:
+        # Layout OCR is optional; let the full-page strategy handle the image
+        logging.warning(f"[OCR] Layout classification failed; falling back to full-page OCR: {e}")
+        return None
+    template = layout_templates.get_layout_template(doc_type)
+    if not template:
+        logging.info(f"[OCR] No layout template for document type {doc_type}")
+        return None
+    
+    from PIL import ImageOps
+    regions = layout_templates.region_pixels(template, *gray.size)
+    # A white border around each crop helps Tesseract find the text baseline
+    passes = [(ImageOps.expand(gray.crop(box), border=10, fill=255), region['config']) for region, box in regions]
+    # The region passes are small and run together, so they count as one attempt
+    budget.consume()
+    results = _run_passes_concurrently(passes, budget)
+    for crop, _ in passes:
+        budget.stats.record_pass(crop)
+    
+    lines = [f"Document type: {doc_type.replace('_', ' ')}"]
+    words = OcrWords()
+    found = 0
+    for (region, box), (_, text, _, region_words, error) in zip(regions, results):
+        value = "; ".join(line.strip() for line in text.splitlines() if line.strip())
+        if error is None and value:
+            found += 1
+            lines.append(f"{region['label']}: {value}")
+            # Region boxes are relative to the bordered crop; move them onto the page
+            words.extend(region_words, offset=(box[0] - 10, box[1] - 10))
+    
+    region_area = sum((box[2] - box[0]) * (box[3] - box[1]) for _, box in regions)
+    processed = sample.width * sample.height + region_area
+    full = gray.width * gray.height
+    logging.info(f"[OCR] Layout OCR for {doc_type}: {found}/{len(regions)} regions with text, "
+                 f"{processed} of {full} pixels processed ({processed / full:.0%})")
+    if found * 2 < len(regions):
+        logging.info("[OCR] Too few layout regions produced text; falling back to full-page OCR")
+        return None
+    budget.words.extend(words)
+    budget.words.set_page_size(1, *gray.size)
+    return "\n".join(lines)
+
+def extract_text_from_image(image_path, budget=None, stream=None):
+    """
+    Extract text from an image file using OCR. When `stream` is given the
+    image is read from it and image_path only supplies the file name.
     """
     try:
         logging.info(f"[OCR] Processing image file: {image_path}")
-        image = Image.open(image_path)
+        image = Image.open(stream if stream is not None else image_path)
         
         # Get image details for logging
         logging.info(f"[OCR] Image size: {image.size}, mode: {image.mode}, format: {image.format}")
         
-        # For PNG files, try multiple preprocessing approaches
-        all_texts = []
-        best_text = ""
+        # Multi-page TIFF scans: every frame is a page. Other multi-frame
+        # formats (MPO, GIF, WebP) hold previews or animation, not pages, so
+        # they go through the planner on their first frame
+        budget = budget or OcrBudget()
+        if image.format == 'TIFF' and getattr(image, 'n_frames', 1) > 1:
+            return extract_text_from_frames(image, image_path, budget)
+        
+        # Fix rotation and skew once so every pass sees upright text
+        image = correct_orientation(image, budget)
         
         # Get the file extension
         _, ext = os.path.splitext(image_path)
         is_png = ext.lower() == '.png'
         
-        # Preprocess the image for better OCR results
-        processed_image = preprocess_image(image, image_path)
+        if OCR_CONFIG['roi_ocr']:
+            layout_text = extract_text_from_layout(image, os.path.basename(image_path), budget)
+            if layout_text:
+                return layout_text
         
-        # Try multiple OCR configurations for better results
-        configs = [
-            custom_config,
-            '--psm 4 --oem 1',  # Assume a single column of text with LSTM only
-            '--psm 3 --oem 1',  # Fully automatic page segmentation with LSTM only
-            '--psm 6 --oem 1',  # Assume a single uniform block of text with LSTM only
-            '--psm 11 --oem 1', # Sparse text - no specific orientation or spacing
-            '--psm 1 --oem 1',  # Auto page segmentation with OSD
-            '--psm 4 --oem 3',  # Assume a single column of text with LSTM + legacy
-            '--psm 3 --oem 3',  # Fully automatic page segmentation with LSTM + legacy
-            '--psm 12 --oem 3'  # Sparse text with OSD with LSTM + legacy
-        ]
+        configs = _ordered_configs(IMAGE_CONFIGS + (PNG_EXTRA_CONFIGS if is_png else []))
         
-        # For PNG files, add more specialized configs that work well with scanned documents
-        if is_png:
-            configs.extend([
-                '--psm 4 --oem 1 -c tessedit_char_whitelist="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789,.;:?!@#$%^&*()-_+=<>[]{}|/\\ "',  # Better for scanned text
-                '--psm 6 --oem 1 -c textord_min_linesize=1.5',  # Better for letter-type documents
-                '--psm 3 --oem 1 -l eng --dpi 300',  # Explicitly set higher DPI
-                '--psm 1 --oem 1 -c textord_heavy_nr=1 -c textord_really_old_xheight=1',  # Better for low quality scans
-            ])
+        # Coarse to fine: the best preprocessing variant at its own resolution with
+        # every config first, and an upscaled copy only if that pass is
+        # unconfident. Then one pass on each remaining variant, the plain
+        # grayscale and the untouched image while the text is still too short.
+        # Variants are only built when reached.
+        variant_count = len(preprocess_variants_for(image_path))
         
-        best_text = ""
+        def reserve_after(step, upscale=False):
+            # Attempts later steps may still need: the upscaled pass while
+            # unconfident, and one pass per remaining variant plus grayscale
+            # and original only while the text is too short to stop. Never
+            # hold back the current step's own next pass: with a low cap the
+            # early, better variants get the attempts rather than nobody.
+            def reserve():
+                held = 1 if upscale and not planner.satisfied() else 0
+                if not planner.has_enough_text():
+                    held += variant_count - step + 1
+                return min(held, max(0, budget.remaining_attempts() - 1))
+            return reserve
         
-        # Try the default config first
-        try:
-            default_text = pytesseract.image_to_string(processed_image, lang=OCR_CONFIG['lang'])
-            if default_text:
-                best_text = default_text
-                all_texts.append(default_text)
-                logging.info(f"[OCR] Default configuration extracted {len(default_text)} chars")
-        except Exception as e:
-            logging.warning(f"[OCR] Default extraction failed: {e}")
+        def plan():
+            variants = iter_preprocessed_variants(image, image_path)
+            for i, (name, variant) in enumerate(variants):
+                # Cropped variants are shifted back onto the page for word boxes
+                transform = (variant_origin(variant), 1.0)
+                if i == 0:
+                    can_upscale = upscale_ratio(variant) > 1
+                    yield name, variant, configs, reserve_after(0, can_upscale), transform
+                    if not planner.satisfied() and can_upscale:
+                        logging.info(f"[OCR] Coarse pass unconfident; upscaling {name} image")
+                        upscaled = upscale_for_ocr(variant)
+                        yield (f"{name}_upscaled", upscaled, [planner.best_config() or configs[0]], reserve_after(0),
+                               (variant_origin(variant), variant.width / upscaled.width))
+                else:
+                    yield name, variant, configs[:1], reserve_after(i), transform
+                if planner.has_enough_text():
+                    return
+            if not planner.has_enough_text():
+                yield 'grayscale', image.convert('L'), configs[:1], reserve_after(variant_count), None
+            if not planner.has_enough_text():
+                yield 'original', image, [''], None, None
         
-        # ALWAYS try alternative configurations regardless of default result
-        # This helps ensure we get the best possible extraction
-        for config in configs:
-                try:
-                    text = pytesseract.image_to_string(processed_image, lang=OCR_CONFIG['lang'], config=config)
-                    logging.info(f"[OCR] Config {config[:10]}... extracted {len(text)} chars")
-                    
-                    # Store all extracted texts
-                    if text:
-                        all_texts.append(text)
-                    
-                    # Choose the configuration that extracts the most text
-                    if len(text) > len(best_text):
-                        best_text = text
-                except Exception as inner_e:
-                    logging.error(f"[OCR] Error with config {config}: {inner_e}")
-                    continue
+        planner = ImageOcrPlanner(image, budget)
+        best_text = planner.execute(plan())
+        budget.words.extend(planner.best_words())
+        budget.words.set_page_size(1, *image.size)
         
         # For PNG files, if best_text is too short, combine all extracted texts
-        _, ext = os.path.splitext(image_path)
-        if ext.lower() == '.png' and len(best_text.strip()) < 50 and all_texts:
+        all_texts = planner.all_texts()
+        if is_png and len(best_text.strip()) < OCR_CONFIG['min_text_length'] and all_texts:
             logging.info(f"[OCR] PNG file with limited text. Combining {len(all_texts)} extracted results")
             # Combine all extracted texts, removing duplicates
             combined_text = "\n\n".join(all_texts)
@@ -204,27 +1098,9 @@ def extract_text_from_image(image_path):
             if len(combined_text) > len(best_text):
                 best_text = combined_text
         
-        if not best_text:
-            logging.warning(f"[OCR] No text extracted from image {image_path}")
-            
-        # Clean the extracted text
-        best_text = clean_extracted_text(best_text)
-        
-        # For PNG files, try direct OCR as a last resort if still no text
-        _, ext = os.path.splitext(image_path)
-        if ext.lower() == '.png' and not best_text:
-            try:
-                logging.info(f"[OCR] Trying direct OCR without preprocessing for PNG file")
-                direct_text = pytesseract.image_to_string(image, lang=OCR_CONFIG['lang'])
-                if direct_text:
-                    best_text = clean_extracted_text(direct_text)
-                    logging.info(f"[OCR] Direct OCR extracted {len(best_text)} chars")
-            except Exception as direct_err:
-                logging.error(f"[OCR] Direct OCR failed: {direct_err}")
-        
         # Log the result
         if len(best_text) > 0:
-            logging.info(f"[OCR] Successfully processed file: {image_path}, text length: {len(best_text)}")
+            logging.info(f"[OCR] Successfully processed file: {image_path}, text length: {len(best_text)}, attempts: {planner.budget.attempts}")
             logging.info(f"[OCR] Sample of extracted text: {best_text[:100]}...")
         else:
             logging.warning(f"[OCR] No usable text extracted from image: {image_path}")
@@ -234,137 +1110,385 @@ def extract_text_from_image(image_path):
         logging.error(f"[OCR] Error extracting text from image: {e}", exc_info=True)
         return ""
 
-def extract_text_from_pdf(pdf_path):
+def extract_text_from_pdf(pdf_path, budget=None, stream=None):
     """
-    Extract text from a PDF file using OCR if needed
+    Extract text from a PDF file, keeping the text layer of pages that have
+    one and OCRing only the image-only pages. When `stream` is given the PDF
+    is read from it and only written to disk if pages need rendering.
     """
     try:
-        extracted_text = ""
-        # First try to extract text directly (if PDF has text layer)
-        pdf_reader = PdfReader(pdf_path)
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text and len(page_text.strip()) > 50: # If substantial text is found
-                extracted_text += page_text + "\n\n"
-        # If sufficient text was extracted directly, return it
-        if len(extracted_text.strip()) > 100: # Threshold can be adjusted
-            return extracted_text
-        # Otherwise, use OCR on the PDF
-        images = pdf_image_conversion(pdf_path)
-        for image in images:
-            # Preprocess the image
-            processed_image = preprocess_image(image)
-            # Apply OCR with custom configuration
-            page_text = pytesseract.image_to_string(processed_image, lang=OCR_CONFIG['lang'], config=custom_config)
-            extracted_text += page_text + "\n\n"
-        return extracted_text
+        pdf_reader = PdfReader(stream if stream is not None else pdf_path)
+        page_texts = []
+        ocr_pages = []
+        for page_number, page in enumerate(pdf_reader.pages, start=1):
+            page_text = page.extract_text() or ""
+            if len(page_text.strip()) >= OCR_CONFIG['text_layer_min_chars']:
+                page_texts.append(page_text)
+            else:
+                page_texts.append("")
+                ocr_pages.append(page_number)
+        logging.info(f"[OCR] PDF {pdf_path}: {len(page_texts) - len(ocr_pages)} text pages, {len(ocr_pages)} pages to OCR")
+        
+        budget = budget or OcrBudget()
+        if ocr_pages:
+            with _document_path(pdf_path, stream) as render_path:
+                for page_number, (page_text, page_words) in _ocr_pdf_pages(render_path, ocr_pages, budget):
+                    page_texts[page_number - 1] = page_text
+                    budget.words.extend(page_words)
+        return "\n\n".join(text for text in page_texts if text.strip())
     except Exception as e:
         print(f"Error extracting text from PDF: {e}")
         return ""
 
-def pdf_image_conversion(pdf_path):
+def _ocr_pdf_page(pdf_path, page_number, image, budget):
     """
-    Convert PDF to images for OCR processing
+    OCR one page rendered at OCR_CONFIG['coarse_dpi'], re-rendering it at the
+    full DPI only if the coarse pass is unconfident and budget remains.
+    Returns (text, words), with word boxes in pixels at the full DPI.
     """
+    scale = OCR_CONFIG['dpi'] / OCR_CONFIG['coarse_dpi']
     try:
-        return pdf2image.convert_from_path(
-            pdf_path, 
-            dpi=OCR_CONFIG['dpi'],
-            output_folder=tempfile.gettempdir(),
-            fmt='png'
+        oriented = correct_orientation(image, budget)
+        processed_image = preprocess_image(oriented)
+        text, confidence, words = ocr_pass(processed_image, custom_config, budget, page_number)
+        budget.stats.record_pass(processed_image, scale)
+        words = _words_on_page(words, processed_image, scale)
+        words.set_page_size(page_number, oriented.width * scale, oriented.height * scale)
+    finally:
+        image.close()
+    if (confidence >= OCR_CONFIG['confidence_threshold'] or OCR_CONFIG['coarse_dpi'] >= OCR_CONFIG['dpi']
+            or budget.expired()):
+        return text, words
+    
+    logging.info(f"[OCR] Page {page_number} coarse confidence {confidence:.1f}; re-rendering at {OCR_CONFIG['dpi']} DPI")
+    budget.stats.pages_refined += 1
+    for _, fine_image in iter_pdf_pages(pdf_path, dpi=OCR_CONFIG['dpi'], first_page=page_number, last_page=page_number):
+        try:
+            oriented = correct_orientation(fine_image, budget)
+            processed_image = preprocess_image(oriented)
+            fine_text, _, fine_words = ocr_pass(processed_image, custom_config, budget, page_number)
+            budget.stats.record_pass(processed_image)
+            fine_words = _words_on_page(fine_words, processed_image)
+            fine_words.set_page_size(page_number, *oriented.size)
+        except Exception as e:
+            # The coarse result stands if the refinement runs out of budget
+            logging.warning(f"[OCR] Refining page {page_number} failed: {e}")
+            return text, words
+        finally:
+            fine_image.close()
+        if sum(fine_words.conf) > sum(words.conf):
+            return fine_text, fine_words
+    return text, words
+
+def _page_runs(page_numbers):
+    """
+    Group sorted page numbers into contiguous (first, last) runs
+    """
+    runs = []
+    for page_number in page_numbers:
+        if runs and runs[-1][1] == page_number - 1:
+            runs[-1][1] = page_number
+        else:
+            runs.append([page_number, page_number])
+    return runs
+
+def _ocr_pdf_pages(pdf_path, page_numbers, budget):
+    """
+    OCR the given PDF pages concurrently and return [(page_number, (text, words))] in page order.
+    """
+    def pages():
+        for first_page, last_page in _page_runs(sorted(page_numbers)):
+            yield from iter_pdf_pages(pdf_path, dpi=OCR_CONFIG['coarse_dpi'], first_page=first_page, last_page=last_page)
+    
+    return _ocr_pages(pages(), lambda page_number, image: _ocr_pdf_page(pdf_path, page_number, image, budget), pdf_path, budget)
+
+def _ocr_pages(pages, ocr_page, source, budget):
+    """
+    Run ocr_page(page_number, image) for each (page_number, image) from the
+    `pages` iterator on the page pool and return [(page_number, result)] in
+    page order. Pages are pulled lazily and at most OCR_CONFIG['page_window']
+    decoded pages are in flight at once. No more pages are started once the
+    budget's time is spent.
+    """
+    executor = _get_executor('pages')
+    window = max(1, OCR_CONFIG['page_window'])
+    in_flight = []
+    results = {}
+    
+    def collect(entry):
+        page_number, future = entry
+        try:
+            results[page_number] = future.result()
+        except Exception as e:
+            logging.error(f"[OCR] OCR failed for page {page_number} of {source}: {e}")
+            results[page_number] = ("", OcrWords())
+    
+    for page_number, image in pages:
+        while len(in_flight) >= window:
+            collect(in_flight.pop(0))
+        if budget.expired():
+            image.close()
+            logging.warning(f"[OCR] Time budget spent at page {page_number} of {source}; remaining pages skipped")
+            budget.truncated = True
+            break
+        in_flight.append((page_number, executor.submit(ocr_page, page_number, image)))
+    for entry in in_flight:
+        collect(entry)
+    return sorted(results.items())
+
+def iter_image_frames(image):
+    """
+    Yield (page_number, frame) for each frame of a multi-frame image such as
+    a multi-page TIFF. Frames are decoded one at a time as they are pulled.
+    """
+    for index in range(getattr(image, 'n_frames', 1)):
+        image.seek(index)
+        yield index + 1, image.copy()
+
+def _ocr_image_frame(page_number, frame, budget):
+    """
+    OCR one frame of a multi-frame image. Returns (text, words).
+    """
+    try:
+        oriented = correct_orientation(frame, budget)
+        processed_image = preprocess_image(oriented)
+        text, _, words = ocr_pass(processed_image, custom_config, budget, page_number)
+        budget.stats.record_pass(processed_image)
+        words = _words_on_page(words, processed_image)
+        words.set_page_size(page_number, *oriented.size)
+    finally:
+        frame.close()
+    return text, words
+
+def extract_text_from_frames(image, image_path, budget=None):
+    """
+    Extract text from every frame of a multi-page TIFF, OCRing frames
+    concurrently under the same memory bounds as PDF pages
+    """
+    budget = budget or OcrBudget()
+    logging.info(f"[OCR] {image_path} has {image.n_frames} frames; OCRing each as a page")
+    page_texts = []
+    for _, (page_text, page_words) in _ocr_pages(iter_image_frames(image),
+                                                 lambda page_number, frame: _ocr_image_frame(page_number, frame, budget),
+                                                 image_path, budget):
+        if page_text.strip():
+            page_texts.append(page_text)
+        budget.words.extend(page_words)
+    return "\n\n".join(page_texts)
+
+def iter_pdf_pages(pdf_path, dpi=None, first_page=1, last_page=None):
+    """
+    Yield (page_number, image) for each PDF page, rendering OCR_CONFIG['page_window']
+    pages at a time in memory so large bundles never hold every page at once
+    """
+    dpi = dpi or OCR_CONFIG['dpi']
+    window = max(1, OCR_CONFIG['page_window'])
+    if last_page is None:
+        last_page = pdf2image.pdfinfo_from_path(pdf_path)['Pages']
+    for start in range(first_page, last_page + 1, window):
+        end = min(start + window - 1, last_page)
+        # No output_folder: pdftoppm streams PPM to stdout so nothing is left on disk
+        images = pdf2image.convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=start,
+            last_page=end,
+            fmt='ppm',
+            thread_count=min(end - start + 1, max(1, OCR_CONFIG['max_workers']))
         )
+        for offset, image in enumerate(images):
+            yield start + offset, image
+        del images
+
+def pdf_image_conversion(pdf_path):
+    """
+    Convert PDF to images for OCR processing.
+    Loads every page into memory; prefer iter_pdf_pages for OCR.
+    """
+    try:
+        return [image for _, image in iter_pdf_pages(pdf_path)]
     except Exception as e:
         print(f"Error converting PDF to images: {e}")
         return []
 
-def extract_text_from_docx(docx_path):
+def extract_text_from_docx(docx_path, stream=None):
     """
-    Extract text from a DOCX file
+    Extract text from a DOCX file, or from `stream` if given
     """
     try:
-        text = docx2txt.process(docx_path)
+        text = docx2txt.process(stream if stream is not None else docx_path)
         return text
     except Exception as e:
         print(f"Error extracting text from DOCX: {e}")
         return ""
 
-def process_document(file_path):
+def process_document(file_path, stream=None):
+    """
+    Process a document file based on its extension and return its text
+    """
+    return extract_document(file_path, stream)["text"]
+
+def open_document_stream(stream):
+    """
+    Return a seekable binary stream for an in-memory document. Bytes-like
+    objects are wrapped without touching disk; unseekable streams are spooled,
+    staying in memory up to OCR_CONFIG['spool_max_bytes'].
+    """
+    if isinstance(stream, (bytes, bytearray, memoryview)):
+        return io.BytesIO(stream)
+    if stream.seekable():
+        stream.seek(0)
+        return stream
+    spooled = tempfile.SpooledTemporaryFile(max_size=OCR_CONFIG['spool_max_bytes'])
+    shutil.copyfileobj(stream, spooled)
+    spooled.seek(0)
+    return spooled
+
+@contextmanager
+def _document_path(file_path, stream=None):
+    """
+    Yield a path for tools that only read files (pdftoppm), writing a
+    streamed document to a temporary file for the duration
+    """
+    if stream is None:
+        yield file_path
+        return
+    _, ext = os.path.splitext(file_path)
+    with tempfile.NamedTemporaryFile(suffix=ext) as tmp:
+        stream.seek(0)
+        shutil.copyfileobj(stream, tmp)
+        tmp.flush()
+        yield tmp.name
+
+def extract_document(file_path, stream=None):
+    """
+    Process a document file and return {"text", "stats", "words", "truncated"},
+    reusing a cached result when the same content has already been OCRed with
+    the current config. words is the column-wise OcrWords of the OCRed pages;
+    text layers and DOCX files contribute none. truncated is True when the
+    document's time budget ran out and the text is the best result so far.
+    
+    Pass `stream` (a file-like object, bytes or memoryview) to process an
+    upload without saving it first; file_path then only supplies the file
+    name and extension.
+    """
+    if stream is not None:
+        stream = open_document_stream(stream)
+    cache = None
+    cache_key = None
+    if OCR_CONFIG['cache_enabled']:
+        try:
+            cache = ocr_cache.get_ocr_cache(OCR_CONFIG['cache_max_bytes'])
+            cache_key = cache.make_key(cache.hash_file(stream if stream is not None else file_path), ocr_config_version())
+            cached = cache.get(cache_key)
+            if cached is not None:
+                result = json.loads(cached)
+                result["text"] = CleanText(result["text"])
+                result.setdefault("truncated", False)
+                result["stats"]["cached"] = True
+                logging.info(f"[OCR] Cache hit for {file_path}, {len(result['text'])} chars")
+                return result
+        except Exception as e:
+            logging.warning(f"[OCR] OCR cache unavailable: {e}")
+            cache = None
+    
+    budget = OcrBudget()
+    text = _extract_document_text(file_path, budget, stream)
+    # Errors and unsupported formats are returned as messages; never cache them
+    is_error = text.startswith(("Error processing document", "Unsupported file format"))
+    if not is_error:
+        text = clean_extracted_text(text)
+    result = {"text": text, "stats": budget.stats.as_dict(), "words": budget.words.as_dict(),
+              "truncated": budget.truncated}
+    result["stats"]["cpu_seconds"] = round(budget.cpu_seconds, 3)
+    result["stats"]["pass_errors"] = len(budget.errors)
+    logging.info(f"[OCR] OCR stats for {file_path}: {result['stats']}")
+    if budget.truncated:
+        logging.warning(f"[OCR] OCR of {file_path} ran out of time; returning a partial result")
+    
+    # A truncated result may improve on a less loaded run, and a failed pass
+    # (missing or crashed tesseract) or empty text may be a transient fault,
+    # so none of them are cached either
+    failed = bool(budget.errors) or not text.strip()
+    if budget.errors:
+        logging.warning(f"[OCR] {len(budget.errors)} OCR passes failed for {file_path}; not caching the result")
+    if cache is not None and not is_error and not budget.truncated and not failed:
+        cache.put(cache_key, json.dumps(result))
+    result["stats"]["cached"] = False
+    return result
+
+def extract_text_from_text_file(file_path, stream=None):
+    """
+    Read a plain text file, or `stream` if given
+    """
+    if stream is not None:
+        return stream.read().decode('utf-8', errors='ignore')
+    with open(file_path, 'r', errors='ignore') as f:
+        return f.read()
+
+def extract_text_from_heic(file_path, budget=None, stream=None):
+    """
+    OCR a HEIC/HEIF phone photo through the image pipeline
+    """
+    if pillow_heif is None:
+        return "Unsupported file format: HEIC (pillow-heif is not installed)"
+    return extract_text_from_image(file_path, budget, stream)
+
+def extract_text_from_doc(file_path, stream=None):
+    """
+    Extract text from a legacy (OLE2) Word .doc file with antiword
+    """
+    if shutil.which('antiword') is None:
+        return "Unsupported file format: legacy Word .doc (antiword is not installed)"
+    with _document_path(file_path, stream) as doc_path:
+        result = subprocess.run(['antiword', doc_path], capture_output=True, timeout=60)
+    if result.returncode != 0:
+        logging.error(f"[OCR] antiword failed for {file_path}: {result.stderr.decode(errors='ignore').strip()}")
+        return ""
+    return result.stdout.decode('utf-8', errors='ignore')
+
+# Extractors by document format, as returned by document_formats.sniff_format.
+# Each takes (file_path, budget, stream) and returns the document text; a new
+# format only needs a signature in document_formats and an entry here.
+EXTRACTORS = {}
+
+def register_extractor(doc_format, extract):
+    EXTRACTORS[doc_format] = extract
+
+register_extractor('image', extract_text_from_image)
+register_extractor('heic', extract_text_from_heic)
+register_extractor('pdf', extract_text_from_pdf)
+register_extractor('docx', lambda file_path, budget, stream: extract_text_from_docx(file_path, stream))
+register_extractor('ole2', lambda file_path, budget, stream: extract_text_from_doc(file_path, stream))
+register_extractor('text', lambda file_path, budget, stream: extract_text_from_text_file(file_path, stream))
+
+def _extract_document_text(file_path, budget, stream=None):
     """
-    Process a document file based on its extension
+    Extract text from a document file with the extractor for its format,
+    sniffed from the content with the extension as a hint
     """
     try:
         _, ext = os.path.splitext(file_path)
         ext = ext.lower()
-        logging.info(f"[OCR] Processing file {file_path} with extension {ext}")
+        doc_format = document_formats.sniff_format(file_path, stream)
+        logging.info(f"[OCR] Processing file {file_path} with extension {ext} as {doc_format}")
         
-        # Extract text based on file type
-        if ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']:
-            # For PNG files, use enhanced processing
-            if ext == '.png':
-                logging.info(f"[OCR] Using enhanced PNG processing for {file_path}")
-                text = extract_text_from_image(file_path)
-                if not text or len(text.strip()) < 50:
-                    # If little or no text was extracted, try more aggressive approaches
-                    logging.warning(f"[OCR] Limited text from PNG file {file_path}, trying alternative methods")
-                    # Try converting image to different formats
-                    try:
-                        image = Image.open(file_path)
-                        # Try grayscale conversion
-                        gray_image = image.convert('L')
-                        with tempfile.NamedTemporaryFile(suffix='.tiff') as tmp:
-                            gray_image.save(tmp.name)
-                            tiff_text = extract_text_from_image(tmp.name)
-                            if len(tiff_text) > len(text):
-                                text = tiff_text
-                                logging.info(f"[OCR] Got better results from TIFF conversion: {len(text)} chars")
-                    except Exception as e:
-                        logging.error(f"[OCR] Format conversion failed: {e}")
-            else:
-                text = extract_text_from_image(file_path)
-            
-            logging.info(f"[OCR] Extracted {len(text)} characters from image")
-        elif ext == '.pdf':
-            text = extract_text_from_pdf(file_path)
-            logging.info(f"[OCR] Extracted {len(text)} characters from PDF")
-        elif ext in ['.docx', '.doc']:
-            text = extract_text_from_docx(file_path)
-            logging.info(f"[OCR] Extracted {len(text)} characters from DOCX")
-        elif ext in ['.txt', '.text']:
-            # Handle plain text files directly
-            with open(file_path, 'r', errors='ignore') as f:
-                text = f.read()
-            logging.info(f"[OCR] Read {len(text)} characters from text file")
-        else:
+        extract = EXTRACTORS.get(doc_format)
+        if extract is None:
             logging.warning(f"[OCR] Unsupported file type: {ext}")
             return f"Unsupported file format: {ext}"
+        if document_formats.EXTENSION_FORMATS.get(ext, doc_format) != doc_format:
+            logging.warning(f"[OCR] {file_path} has extension {ext} but contains {doc_format}")
+        
+        text = extract(file_path, budget, stream)
+        logging.info(f"[OCR] Extracted {len(text)} characters as {doc_format}")
+        if text.startswith("Unsupported file format"):
+            return text
             
-        # If very little text was extracted, try alternative methods
+        # Image-only PDF pages were already OCRed page by page, with coarse to
+        # fine refinement, so there is nothing further to retry here
         if len(text.strip()) < 50:
-            logging.warning(f"[OCR] Very little text extracted from {file_path}, trying alternative methods")
-            
-            # For all file types, try converting to image and processing
-            if ext == '.pdf':
-                try:
-                    # Convert first page to image and retry
-                    images = pdf_image_conversion(file_path)
-                    if images:
-                        backup_text = extract_text_from_image(images[0])
-                        if len(backup_text) > len(text):
-                            text = backup_text
-                            logging.info(f"[OCR] Used image conversion for PDF, got {len(text)} chars")
-                except Exception as backup_err:
-                    logging.error(f"[OCR] Backup extraction failed: {backup_err}")
-            elif ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']:
-                # For images, try with different preprocessing
-                try:
-                    # Load the image directly without preprocessing
-                    image = Image.open(file_path)
-                    direct_text = pytesseract.image_to_string(image, lang=OCR_CONFIG['lang'])
-                    if len(direct_text) > len(text):
-                        text = direct_text
-                        logging.info(f"[OCR] Used direct image OCR, got {len(text)} chars")
-                except Exception as img_err:
-                    logging.error(f"[OCR] Alternative image OCR failed: {img_err}")
+            logging.warning(f"[OCR] Very little text extracted from {file_path}")
         
         # Log a sample of the extracted text for debugging
         if text:
@@ -377,36 +1501,67 @@ def process_document(file_path):
         logging.error(f"[OCR] Error processing document: {e}", exc_info=True)
         return f"Error processing document: {str(e)}"
 
+class CleanText(str):
+    """
+    Text that has already been through clean_extracted_text, so later calls
+    return it as is instead of scanning it again
+    """
+
+class _CleaningTable(dict):
+    """
+    str.translate table for OCR output. ASCII and Latin-1 letters (names such
+    as Zoë or José) are kept, as are the pound and euro signs. Typographic
+    quotes, dashes and spaces become their ASCII forms, and every other
+    character becomes a space. Entries are filled in on first lookup.
+    """
+    _KEEP = set('£€') | {chr(c) for c in range(0xC0, 0x100)} - set('×÷')
+    _ASCII = {
+        '\u00a0': ' ', '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u201c': '"',
+        '\u201d': '"', '\u201e': '"', '\u2013': '-', '\u2014': '-', '\u2212': '-',
+        '\u2026': '...', '\u2022': '-', '\u00b7': '-',
+    }
+    
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        if codepoint < 0x80 or char in self._KEEP:
+            value = char
+        else:
+            value = self._ASCII.get(char, ' ')
+        self[codepoint] = value
+        return value
+
+_CLEANING_TABLE = _CleaningTable()
+# Runs of spaces collapse to one; three or more newlines collapse to a blank line
+_WHITESPACE_RUNS = re.compile(r'( ) +|(\n\n)\n+')
+
 def clean_extracted_text(text):
     """
-    Clean and normalize extracted text
+    Clean and normalize extracted text in one translate and one regex pass.
+    Returns a CleanText, which later calls pass straight through.
     """
+    if isinstance(text, CleanText):
+        return text
     if not text:
-        return ""
+        return CleanText("")
         
     # Convert to string if not already
     if not isinstance(text, str):
         text = str(text)
-        
-    # Remove excessive whitespace but preserve line breaks for structure
-    text = re.sub(r' {2,}', ' ', text)  # Multiple spaces to single space
-    text = re.sub(r'\n{3,}', '\n\n', text)  # Multiple newlines to double newline
-    
-    # Remove unusual characters but keep more symbols that might be important
-    text = re.sub(r'[^\x00-\x7F]+', ' ', text)
-    
-    # Log cleaning results
-    logging.info(f"[OCR] Text cleaning: before {len(text) if text else 0} chars, after {len(text.strip()) if text else 0} chars")
     
-    return text.strip()
+    # isascii() and the substring checks are cheap and skip passes with nothing to do
+    if not text.isascii():
+        text = text.translate(_CLEANING_TABLE)
+    if '  ' in text or '\n\n\n' in text:
+        text = _WHITESPACE_RUNS.sub(r'\1\2', text)
+    return CleanText(text.strip())
 
-def extract_document_metadata(file_path):
+def extract_document_metadata(file_path, file_size=None):
     """
     Extract metadata from document if available
     """
     metadata = {
         "filename": os.path.basename(file_path),
-        "file_size": os.path.getsize(file_path),
+        "file_size": os.path.getsize(file_path) if file_size is None else file_size,
         "file_type": os.path.splitext(file_path)[1].lower(),
     }
     # Add more metadata extraction based on file type
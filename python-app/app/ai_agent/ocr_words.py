@@ -0,0 +1,89 @@
+from array import array
+
+class OcrWords:
+    """
+    Per-word OCR results for one document, stored column-wise.
+
+    Confidences, bounding boxes and page numbers live in typed arrays rather
+    than one dict per word, so a multi-page document costs a few bytes per
+    word and serializes to a handful of flat JSON lists. Boxes are
+    (left, top, width, height), flattened four values per word. In a
+    document's words they are in page pixels: the upright page as decoded for
+    images, and the page rendered at OCR_CONFIG['dpi'] for PDFs. page_sizes
+    holds each page's (width, height) in the same pixels, so boxes can be
+    normalized and compared across pages and documents.
+    """
+
+    __slots__ = ('text', 'conf', 'bbox', 'page', 'page_sizes')
+
+    def __init__(self):
+        self.text = []
+        self.conf = array('f')
+        self.bbox = array('i')
+        self.page = array('H')
+        self.page_sizes = {}
+
+    def __len__(self):
+        return len(self.text)
+
+    def __iter__(self):
+        """
+        Yield (text, confidence, (left, top, width, height), page) per word
+        """
+        for i, word in enumerate(self.text):
+            yield word, self.conf[i], tuple(self.bbox[i * 4:i * 4 + 4]), self.page[i]
+
+    def append(self, text, conf, left, top, width, height, page=1):
+        self.text.append(text)
+        self.conf.append(conf)
+        self.bbox.extend((left, top, width, height))
+        self.page.append(page)
+
+    def set_page_size(self, page, width, height):
+        self.page_sizes[page] = (int(width), int(height))
+
+    def extend(self, other, page=None, offset=(0, 0), scale=1.0):
+        """
+        Append another result's words, optionally moving them to a page and
+        mapping their boxes to (x * scale + dx, y * scale + dy), e.g. from an
+        upscaled crop back to the full page
+        """
+        self.text.extend(other.text)
+        self.conf.extend(other.conf)
+        if offset == (0, 0) and scale == 1.0:
+            self.bbox.extend(other.bbox)
+        else:
+            dx, dy = offset
+            for i in range(0, len(other.bbox), 4):
+                self.bbox.extend((round(other.bbox[i] * scale + dx), round(other.bbox[i + 1] * scale + dy),
+                                  round(other.bbox[i + 2] * scale), round(other.bbox[i + 3] * scale)))
+        if page is None:
+            self.page.extend(other.page)
+            self.page_sizes.update(other.page_sizes)
+        else:
+            self.page.extend([page] * len(other.text))
+
+    def mean_confidence(self):
+        return sum(self.conf) / len(self.conf) if self.conf else 0.0
+
+    def as_dict(self):
+        """
+        Return a JSON-serializable, column-wise form of the words
+        """
+        return {
+            "text": list(self.text),
+            "conf": [round(conf, 1) for conf in self.conf],
+            "bbox": self.bbox.tolist(),
+            "page": self.page.tolist(),
+            "page_sizes": {str(page): list(size) for page, size in sorted(self.page_sizes.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        words = cls()
+        words.text = list(data.get("text", []))
+        words.conf = array('f', data.get("conf", []))
+        words.bbox = array('i', data.get("bbox", []))
+        words.page = array('H', data.get("page", []))
+        words.page_sizes = {int(page): tuple(size) for page, size in data.get("page_sizes", {}).items()}
+        return words
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+"""
+OCR throughput benchmark over the customer test documents and synthetically
+degraded copies of them (rotated, skewed, low-DPI, noisy).
+
+For every document and variant it reports latency, Tesseract invocations,
+peak RSS and, when a ground-truth transcript exists, character accuracy.
+Transcripts are plain text files named after the document (<name>.txt) in
+the --truth directory, which defaults to the documents directory.
+
+Usage:
+    python scripts/maintenance/benchmark-ocr.py [--variants original,noisy] [--truth DIR] [--json out.json]
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import difflib
+import argparse
+import logging
+import resource
+import threading
+
+# Add the python-app/app/ai_agent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'python-app', 'app', 'ai_agent')))
+
+from PIL import Image
+import ocr_utils
+
+TEST_DOCS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Test Docs', 'Customer_test_documents'))
+
+# Configure logging
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def _rotated(image):
+    return image.rotate(90, expand=True, fillcolor='white')
+
+def _skewed(image):
+    return image.rotate(3, expand=True, fillcolor='white', resample=Image.BICUBIC)
+
+def _low_dpi(image):
+    # A 300 DPI scan saved as if it were captured at 100 DPI
+    return image.resize((image.width // 3, image.height // 3), Image.LANCZOS)
+
+def _noisy(image):
+    noise = Image.effect_noise(image.size, 64)
+    return Image.blend(image, noise, 0.25)
+
+DEGRADATIONS = {
+    'original': None,
+    'rotated': _rotated,
+    'skewed': _skewed,
+    'low_dpi': _low_dpi,
+    'noisy': _noisy,
+}
+
+class TesseractCounter:
+    """
+    Counts calls into the active OCR engine
+    """
+    def __init__(self, engine):
+        self.calls = 0
+        self._lock = threading.Lock()
+        for name in ('image_to_data', 'image_to_string', 'detect_orientation'):
+            setattr(engine, name, self._counted(getattr(engine, name)))
+
+    def _counted(self, method):
+        def wrapper(*args, **kwargs):
+            with self._lock:
+                self.calls += 1
+            return method(*args, **kwargs)
+        return wrapper
+
+def reset_peak_rss():
+    """
+    Reset the kernel's peak RSS counter for this process (Linux only).
+    Returns False when the peak can only be reported for the whole run.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def character_accuracy(text, truth):
+    """
+    1 - (character edits / truth length) after collapsing whitespace, with
+    edits counted from difflib's alignment of the two texts
+    """
+    text = ' '.join(text.split())
+    truth = ' '.join(truth.split())
+    if not truth:
+        return None
+    edits = 0
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, text, truth, autojunk=False).get_opcodes():
+        if tag != 'equal':
+            edits += max(i2 - i1, j2 - j1)
+    return round(max(0.0, 1 - edits / len(truth)), 4)
+
+def load_truth(truth_dir, filename):
+    path = os.path.join(truth_dir, os.path.splitext(filename)[0] + '.txt')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+def benchmark_document(filename, variant, data, counter, truth):
+    reset_peak_rss()
+    calls_before = counter.calls
+    start = time.perf_counter()
+    result = ocr_utils.extract_document(filename, data)
+    seconds = time.perf_counter() - start
+    entry = {
+        "file": filename,
+        "variant": variant,
+        "seconds": round(seconds, 3),
+        "tesseract_calls": counter.calls - calls_before,
+        "peak_rss_mb": peak_rss_mb(),
+        "chars": len(result["text"]),
+        "words": len(result["words"]["text"]),
+        "mean_confidence": round(sum(result["words"]["conf"]) / len(result["words"]["conf"]), 1) if result["words"]["conf"] else None,
+        "truncated": result["truncated"],
+    }
+    if truth is not None:
+        entry["char_accuracy"] = character_accuracy(result["text"], truth)
+    return entry
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', default=TEST_DOCS_DIR, help='Directory of documents to benchmark')
+    parser.add_argument('--truth', help='Directory of <name>.txt ground-truth transcripts (default: --docs)')
+    parser.add_argument('--variants', default=','.join(DEGRADATIONS), help='Comma-separated variants to run')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    variants = [v.strip() for v in args.variants.split(',') if v.strip()]
+    unknown = [v for v in variants if v not in DEGRADATIONS]
+    if unknown:
+        sys.exit(f"Unknown variants: {', '.join(unknown)}")
+    truth_dir = args.truth or args.docs
+
+    # Measure OCR work, not cache lookups
+    ocr_utils.OCR_CONFIG['cache_enabled'] = False
+    counter = TesseractCounter(ocr_utils.get_ocr_engine())
+
+    results = []
+    for filename in sorted(os.listdir(args.docs)):
+        path = os.path.join(args.docs, filename)
+        if not os.path.isfile(path) or filename.endswith('.txt'):
+            continue
+        with open(path, 'rb') as f:
+            original = f.read()
+        truth = load_truth(truth_dir, filename)
+        for variant in variants:
+            degrade = DEGRADATIONS[variant]
+            if degrade is None:
+                data = original
+            else:
+                try:
+                    image = Image.open(io.BytesIO(original)).convert('L')
+                except Exception:
+                    continue  # Degraded variants only apply to images
+                buffer = io.BytesIO()
+                degrade(image).save(buffer, format='PNG')
+                data = buffer.getvalue()
+            entry = benchmark_document(filename, variant, data, counter, truth)
+            results.append(entry)
+            print(f"{filename[:40]:40} {variant:9} {entry['seconds']:8.2f}s "
+                  f"{entry['tesseract_calls']:3d} calls {entry['peak_rss_mb']:8.1f} MB "
+                  f"acc {entry.get('char_accuracy', '-')}{' TRUNCATED' if entry['truncated'] else ''}")
+
+    summary = {
+        "documents": len(results),
+        "total_seconds": round(sum(r["seconds"] for r in results), 3),
+        "total_tesseract_calls": sum(r["tesseract_calls"] for r in results),
+        "max_peak_rss_mb": max((r["peak_rss_mb"] for r in results), default=0),
+        "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+    accuracies = [r["char_accuracy"] for r in results if r.get("char_accuracy") is not None]
+    if accuracies:
+        summary["mean_char_accuracy"] = round(sum(accuracies) / len(accuracies), 4)
+    print(json.dumps(summary, indent=2))
+
+    if args.json:
+        report = {
+            "ocr_config_version": ocr_utils.ocr_config_version(),
+            "engine": ocr_utils.get_ocr_engine().name,
+            "summary": summary,
+            "results": results,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()